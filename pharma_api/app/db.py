@@ -1,5 +1,6 @@
 from psycopg_pool import ConnectionPool
 from psycopg.rows import dict_row
+from psycopg.types.numeric import FloatLoader
 from contextlib import contextmanager
 from .config import settings
 
@@ -22,3 +23,8 @@ def get_conn():
             cur.execute("SET LOCAL idle_in_transaction_session_timeout = 60000;")
             cur.execute("SET LOCAL application_name = 'pharma_api';")
         yield conn
+
+def numeric_as_float(cur):
+    """Load NUMERIC columns as float on this cursor so trusted rows already match float schemas."""
+    cur.adapters.register_loader("numeric", FloatLoader)
+    return cur
@@ -1,6 +1,5 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import orjson
 from .config import settings, CORS_ORIGINS, CORS_METHODS, CORS_HEADERS
 from .routers import pharmacies, days, stock, agg, logbook, products, usage, users
 from .routers import notifications
@@ -10,16 +9,6 @@ from .routers import admin
 from .routers import debtors
 from .routers import banking, ledger, bank_imports, accounts, bank_rules, bank_statement_lines, management_statement
 
-class ORJSONResponse:
-    media_type = "application/json"
-    def __init__(self, content, status_code=200, headers=None):
-        self.content = content
-        self.status_code = status_code
-        self.headers = headers or {}
-    def __call__(self, scope, receive, send):
-        # not used directly; FastAPI handles response class
-        pass
-
 app = FastAPI(
     title="Pharmacy Data API",
     description="API for pharmacy sales, inventory, and analytics data",
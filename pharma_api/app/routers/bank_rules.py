@@ -668,6 +668,9 @@ def accept_ai_suggestion(suggestion_id: int, request: Optional[AcceptAISuggestio
                 WHERE id = %s
             """, (suggestion_id,))
             
+            # Learn the mapping so similar descriptions skip the model next time
+            BankAiClassifier.record_accepted(cur, txn['description'], account_id)
+            
             conn.commit()
             
             return {
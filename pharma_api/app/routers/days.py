@@ -1,13 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from typing import List
 from datetime import date
-from ..db import get_conn
-from ..schemas import DailySales, FrontshopDispensaryGP, GPBreakdown
+from ..db import get_conn, numeric_as_float
+from ..schemas import DailySales, DAILY_SALES_LIST, FrontshopDispensaryGP, GPBreakdown
 from ..auth import require_api_key
 
 router = APIRouter(prefix="/pharmacies/{pid}/days", tags=["daily"], dependencies=[Depends(require_api_key)])
 
-@router.get("", response_model=List[DailySales])
+@router.get("", response_model=None, response_class=Response, responses={200: {"model": List[DailySales]}})
 def list_days(pid: int, from_: str = Query(..., alias="from"), to: str = Query(..., alias="to")):
     # Use group view for TLC GROUP (pharmacy_id=100), else normal per-pharmacy view
     sql = (
@@ -25,10 +25,13 @@ def list_days(pid: int, from_: str = Query(..., alias="from"), to: str = Query(.
         """
     )
     with get_conn() as conn, conn.cursor() as cur:
+        numeric_as_float(cur)
         cur.execute(sql, (pid, from_, to))
-        return cur.fetchall()
+        rows = [DailySales.from_db(r) for r in cur.fetchall()]
+    # Serialize the whole list in one pass through pydantic-core's JSON encoder
+    return Response(content=DAILY_SALES_LIST.dump_json(rows), media_type="application/json")
 
-@router.get("/{bdate}", response_model=DailySales)
+@router.get("/{bdate}", response_model=None, response_class=Response, responses={200: {"model": DailySales}})
 def one_day(pid: int, bdate: str):
     # Use group view for TLC GROUP (pharmacy_id=100), else normal per-pharmacy view
     sql = (
@@ -44,11 +47,13 @@ def one_day(pid: int, bdate: str):
         """
     )
     with get_conn() as conn, conn.cursor() as cur:
+        numeric_as_float(cur)
         cur.execute(sql, (pid, bdate))
         row = cur.fetchone()
         if not row:
             raise HTTPException(404, "Not found")
-        return row
+    # Row is trusted; serialize it directly instead of letting FastAPI re-validate it
+    return Response(content=DailySales.from_db(row).model_dump_json(), media_type="application/json")
 
 @router.get("/gp-breakdown", response_model=FrontshopDispensaryGP)
 def get_gp_breakdown_range(
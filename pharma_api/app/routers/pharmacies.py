@@ -1,18 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from typing import List, Optional
 from datetime import datetime
 from ..db import get_conn
-from ..schemas import Pharmacy, ReconciliationSummary
+from ..schemas import Pharmacy, PHARMACY_LIST, ReconciliationSummary
 # from ..auth import require_api_key
 
 router = APIRouter(prefix="/pharmacies", tags=["pharmacies"]) # , dependencies=[Depends(require_api_key)]
 
-@router.get("", response_model=List[Pharmacy])
+@router.get("", response_model=None, response_class=Response, responses={200: {"model": List[Pharmacy]}})
 def list_pharmacies():
     from ..db import get_conn
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute("SELECT pharmacy_id, name FROM pharma.pharmacies WHERE is_active ORDER BY pharmacy_id;")
-        return cur.fetchall()
+        pharmacies = PHARMACY_LIST.validate_python(cur.fetchall())
+    # Validated once above; serialize directly instead of letting FastAPI re-validate
+    return Response(content=PHARMACY_LIST.dump_json(pharmacies), media_type="application/json")
 
 @router.patch("/{pharmacy_id}/deactivate")
 def deactivate_pharmacy(pharmacy_id: int):
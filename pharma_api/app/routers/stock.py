@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
 from typing import Optional
-from ..db import get_conn
+from ..db import get_conn, numeric_as_float
 from ..schemas import StockPage, BestSellerPage, LowGPPage
 from ..auth import require_api_key
 
 router = APIRouter(prefix="/pharmacies/{pid}/stock-activity", tags=["stock"], dependencies=[Depends(require_api_key)])
 
-@router.get("", response_model=StockPage)
+@router.get("", response_model=None, response_class=ORJSONResponse, responses={200: {"model": StockPage}})
 def stock_activity(pid: int, date: str, limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None):
     where_cur = ""
     params = []
@@ -42,15 +43,16 @@ def stock_activity(pid: int, date: str, limit: int = Query(50, ge=1, le=200), cu
         """
         params = [pid, date] + params
     with get_conn() as conn, conn.cursor() as cur:
+        numeric_as_float(cur)
         cur.execute(sql, tuple(params))
         rows = cur.fetchall()
     next_cur = None
     if rows:
         last = rows[-1]
         next_cur = f"{last['sales_val']}:{last['product_id']}"
-    return {"items": rows, "nextCursor": next_cur}
+    return ORJSONResponse({"items": rows, "nextCursor": next_cur})
 
-@router.get("/by-quantity", response_model=StockPage)
+@router.get("/by-quantity", response_model=None, response_class=ORJSONResponse, responses={200: {"model": StockPage}})
 def stock_activity_by_quantity(pid: int, date: str, limit: int = Query(50, ge=1, le=200)):
     if pid == 100:
         sql = """
@@ -77,11 +79,12 @@ def stock_activity_by_quantity(pid: int, date: str, limit: int = Query(50, ge=1,
         """
         params = (pid, date, limit)
     with get_conn() as conn, conn.cursor() as cur:
+        numeric_as_float(cur)
         cur.execute(sql, params)
         rows = cur.fetchall()
-    return {"items": rows, "nextCursor": None}
+    return ORJSONResponse({"items": rows, "nextCursor": None})
 
-@router.get("/worst-gp", response_model=StockPage)
+@router.get("/worst-gp", response_model=None, response_class=ORJSONResponse, responses={200: {"model": StockPage}})
 def stock_activity_worst_gp(pid: int, date: str, limit: int = Query(50, ge=1, le=200)):
     if pid == 100:
         sql = """
@@ -108,11 +111,12 @@ def stock_activity_worst_gp(pid: int, date: str, limit: int = Query(50, ge=1, le
         """
         params = (pid, date, limit)
     with get_conn() as conn, conn.cursor() as cur:
+        numeric_as_float(cur)
         cur.execute(sql, params)
         rows = cur.fetchall()
-    return {"items": rows, "nextCursor": None}
+    return ORJSONResponse({"items": rows, "nextCursor": None})
 
-@router.get("/negative-soh", response_model=StockPage)
+@router.get("/negative-soh", response_model=None, response_class=ORJSONResponse, responses={200: {"model": StockPage}})
 def stock_activity_negative_soh(pid: int, date: str, limit: int = Query(50, ge=1, le=200)):
     """Return items where on_hand < 0 for the given day, ordered by most negative."""
     if pid == 100:
@@ -140,11 +144,12 @@ def stock_activity_negative_soh(pid: int, date: str, limit: int = Query(50, ge=1
         """
         params = (pid, date, limit)
     with get_conn() as conn, conn.cursor() as cur:
+        numeric_as_float(cur)
         cur.execute(sql, params)
         rows = cur.fetchall()
-    return {"items": rows, "nextCursor": None}
+    return ORJSONResponse({"items": rows, "nextCursor": None})
 
-@router.get("/by-quantity/range", response_model=BestSellerPage)
+@router.get("/by-quantity/range", response_model=None, response_class=ORJSONResponse, responses={200: {"model": BestSellerPage}})
 def best_sellers_by_quantity(
     pid: int,
     from_date: str = Query(..., alias="from", description="Start date YYYY-MM-DD"),
@@ -200,12 +205,13 @@ def best_sellers_by_quantity(
         params = (pid, from_date, to_date, limit)
     
     with get_conn() as conn, conn.cursor() as cur:
+        numeric_as_float(cur)
         cur.execute(sql, params)
         rows = cur.fetchall()
     
-    return {"items": rows}
+    return ORJSONResponse({"items": rows})
 
-@router.get("/low-gp/range", response_model=LowGPPage)
+@router.get("/low-gp/range", response_model=None, response_class=ORJSONResponse, responses={200: {"model": LowGPPage}})
 def low_gp_products(
     pid: int,
     from_date: str = Query(..., alias="from", description="Start date YYYY-MM-DD"),
@@ -284,7 +290,8 @@ def low_gp_products(
         params = (pid, from_date, to_date, threshold, limit)
     
     with get_conn() as conn, conn.cursor() as cur:
+        numeric_as_float(cur)
         cur.execute(sql, params)
         rows = cur.fetchall()
     
-    return {"items": rows}
+    return ORJSONResponse({"items": rows})
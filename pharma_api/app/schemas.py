@@ -1,12 +1,22 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 from typing import Optional, List
+from typing_extensions import TypedDict
 from datetime import date, datetime
 
+# Shared config for read models built from psycopg dict rows
+DB_ROW_CONFIG = ConfigDict(extra='ignore', from_attributes=True, populate_by_name=True)
+# Same, for read-only DTOs that go DB -> JSON once and are never mutated
+FROZEN_DB_ROW_CONFIG = ConfigDict(**DB_ROW_CONFIG, frozen=True)
+
 class Pharmacy(BaseModel):
+    model_config = FROZEN_DB_ROW_CONFIG
+
     pharmacy_id: int
     name: str
 
 class DailySales(BaseModel):
+    model_config = DB_ROW_CONFIG
+
     business_date: date
     pharmacy_id: int
     turnover: Optional[float] = None
@@ -33,6 +43,11 @@ class DailySales(BaseModel):
     frontshop_pct: Optional[float] = None
     frontshop_turnover: Optional[float] = None
 
+    @classmethod
+    def from_db(cls, row: dict) -> "DailySales":
+        """Build from a trusted psycopg row without validation. Never use for user-supplied payloads."""
+        return cls.model_construct(**row)
+
 class GPBreakdown(BaseModel):
     """GP breakdown for a single segment (dispensary or frontshop)"""
     product_count: int
@@ -53,6 +68,8 @@ class FrontshopDispensaryGP(BaseModel):
     difference: Optional[float] = None
 
 class StockItem(BaseModel):
+    model_config = FROZEN_DB_ROW_CONFIG
+
     department_code: Optional[str] = None
     product_code: str
     description: Optional[str] = None
@@ -64,18 +81,45 @@ class StockItem(BaseModel):
     on_hand: Optional[float] = None
     product_id: int
 
+class StockItemTD(TypedDict):
+    """Row shape of StockItem as a TypedDict, used for hot-path page items"""
+    department_code: Optional[str]
+    product_code: str
+    description: Optional[str]
+    qty_sold: Optional[float]
+    sales_val: Optional[float]
+    cost_of_sales: Optional[float]
+    gp_value: Optional[float]
+    gp_pct: Optional[float]
+    on_hand: Optional[float]
+    product_id: int
+
 class StockPage(BaseModel):
-    items: List[StockItem]
+    model_config = DB_ROW_CONFIG
+
+    items: List[StockItemTD]
     nextCursor: Optional[str] = None
 
 class CoverageRow(BaseModel):
+    model_config = FROZEN_DB_ROW_CONFIG
+
     business_date: date
     pharmacy_id: int
     inv249_turnover: bool
     stk261_trading: bool
     phm080_scripts: bool
     stk260_gp: bool
-    last_updated: Optional[datetime] = None
+    last_updated: datetime
+
+    @classmethod
+    def from_db(cls, row: dict) -> "CoverageRow":
+        """Build from a trusted psycopg row without validation. Never use for user-supplied payloads."""
+        return cls.model_construct(**row)
+
+# List validators compiled once at import time for list endpoints
+PHARMACY_LIST = TypeAdapter(List[Pharmacy])
+DAILY_SALES_LIST = TypeAdapter(List[DailySales])
+COVERAGE_ROW_LIST = TypeAdapter(List[CoverageRow])
 
 class ProductUsage(BaseModel):
     product_code: str
@@ -1,5 +1,5 @@
 import asyncio
-import json
+import orjson
 import logging
 import time
 import jwt
@@ -10,6 +10,10 @@ from cryptography.hazmat.primitives.asymmetric import ec
 
 logger = logging.getLogger(__name__)
 
+# APNs closes idle HTTP/2 connections after about an hour; ping well inside that
+KEEPALIVE_INTERVAL_SECONDS = 600
+APNS_PRODUCTION_ORIGIN = "https://api.push.apple.com/"
+
 class ApplePushService:
     def __init__(self, team_id: str, key_id: str, private_key_path: str, bundle_id: str):
         """
@@ -27,6 +31,8 @@ class ApplePushService:
         self.bundle_id = bundle_id
         self.token = None
         self.token_expiry = 0
+        self._client: Optional[httpx.AsyncClient] = None
+        self._keepalive_task: Optional[asyncio.Task] = None
         self._load_private_key()
     
     def _load_private_key(self):
@@ -78,6 +84,44 @@ class ApplePushService:
             logger.error(f"Failed to generate Apple APNs token: {e}")
             return None
     
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared HTTP/2 client so pushes reuse one TLS connection per APNs host"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=30,
+                http2=True,
+                limits=httpx.Limits(keepalive_expiry=3600)
+            )
+        return self._client
+    
+    async def warm_up(self):
+        """Open the production HTTP/2 connection ahead of the first push"""
+        try:
+            # Any response (typically 404) means the handshake is done
+            await self._get_client().get(APNS_PRODUCTION_ORIGIN, timeout=5)
+        except Exception as e:
+            logger.warning(f"APNs connection warm-up failed: {e}")
+    
+    async def _keepalive(self):
+        """Periodically touch the production host so Apple doesn't idle-close the connection"""
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL_SECONDS)
+            await self.warm_up()
+    
+    def start_keepalive(self):
+        """Start the background keepalive task on the running event loop"""
+        if self._keepalive_task is None or self._keepalive_task.done():
+            self._keepalive_task = asyncio.create_task(self._keepalive())
+    
+    async def aclose(self):
+        """Stop the keepalive task and close the HTTP client"""
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
     async def send_notification(
         self, 
         device_token: str, 
@@ -137,28 +181,27 @@ class ApplePushService:
     async def _send_to_endpoint(self, url: str, payload: dict, headers: dict, device_token: str, env: str) -> Dict[str, Any]:
         """Helper method to send notification to a specific APNs endpoint"""
         try:
-            async with httpx.AsyncClient(timeout=30, http2=True) as client:
-                response = await client.post(url, json=payload, headers=headers)
-                
-                # Log the full response for debugging
-                logger.info(f"APNs {env} Response - Status: {response.status_code}, Headers: {dict(response.headers)}, Body: {response.text}")
+            response = await self._get_client().post(url, content=orjson.dumps(payload), headers=headers)
+            
+            # Log the full response for debugging
+            logger.info(f"APNs {env} Response - Status: {response.status_code}, Headers: {dict(response.headers)}, Body: {response.text}")
+            
+            if response.status_code == 200:
+                apns_id = response.headers.get("apns-id")
+                logger.info(f"APNs {env} SUCCESS - Token: {device_token[:20]}..., APNS-ID: {apns_id}")
+                return {"status": "success", "apns_id": apns_id}
+            elif response.status_code == 410:
+                # Device token is invalid/expired
+                logger.warning(f"APNs {env} UNREGISTERED - Token: {device_token[:20]}..., Response: {response.text}")
+                return {"status": "unregistered", "error": "Device token is invalid or expired"}
+            elif response.status_code == 400:
+                # Bad request (bad token format, etc.)
+                logger.error(f"APNs {env} BAD_TOKEN - Token: {device_token[:20]}..., Response: {response.text}")
+                return {"status": "bad_token", "error": f"Bad device token format ({env}): {response.text}"}
+            else:
+                logger.error(f"APNs {env} ERROR - Status: {response.status_code}, Token: {device_token[:20]}..., Response: {response.text}")
+                return {"status": "error", "error": f"APNs {env} error: {response.status_code} - {response.text}"}
                 
-                if response.status_code == 200:
-                    apns_id = response.headers.get("apns-id")
-                    logger.info(f"APNs {env} SUCCESS - Token: {device_token[:20]}..., APNS-ID: {apns_id}")
-                    return {"status": "success", "apns_id": apns_id}
-                elif response.status_code == 410:
-                    # Device token is invalid/expired
-                    logger.warning(f"APNs {env} UNREGISTERED - Token: {device_token[:20]}..., Response: {response.text}")
-                    return {"status": "unregistered", "error": "Device token is invalid or expired"}
-                elif response.status_code == 400:
-                    # Bad request (bad token format, etc.)
-                    logger.error(f"APNs {env} BAD_TOKEN - Token: {device_token[:20]}..., Response: {response.text}")
-                    return {"status": "bad_token", "error": f"Bad device token format ({env}): {response.text}"}
-                else:
-                    logger.error(f"APNs {env} ERROR - Status: {response.status_code}, Token: {device_token[:20]}..., Response: {response.text}")
-                    return {"status": "error", "error": f"APNs {env} error: {response.status_code} - {response.text}"}
-                    
         except Exception as e:
             logger.error(f"Error sending Apple push notification to {env} for {device_token[:20]}...: {e}")
             return {"status": "error", "error": str(e)}
@@ -193,15 +236,24 @@ class ApplePushService:
         
         return results
 
+# Process-wide instance so the HTTP/2 connection and JWT are reused across sends
+_apple_push_service: Optional[ApplePushService] = None
+
 # Factory function to create the service
 def create_apple_push_service() -> Optional[ApplePushService]:
     """
     Create Apple Push service if credentials are available
     
+    The instance is cached, so repeated calls share one connection.
+    
     Returns:
         ApplePushService instance or None if credentials missing
     """
     import os
+    global _apple_push_service
+    
+    if _apple_push_service is not None:
+        return _apple_push_service
     
     team_id = os.getenv("APPLE_TEAM_ID")
     key_id = os.getenv("APPLE_KEY_ID")
@@ -213,7 +265,8 @@ def create_apple_push_service() -> Optional[ApplePushService]:
         return None
     
     try:
-        return ApplePushService(team_id, key_id, private_key_path, bundle_id)
+        _apple_push_service = ApplePushService(team_id, key_id, private_key_path, bundle_id)
+        return _apple_push_service
     except Exception as e:
         logger.error(f"Failed to create Apple Push service: {e}")
         return None 
\ No newline at end of file
@@ -3,13 +3,73 @@ Bank AI Classifier
 Uses AI to suggest account classifications for unclassified bank transactions.
 """
 
+import functools
 import logging
-import json
+import re
+import orjson
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Transactions classified between progress checkpoints
+CHUNK_SIZE = 25
+# Longest transaction description sent to the model
+MAX_DESCRIPTION_CHARS = 200
+# Memo entries must be this confident, over this many accepted suggestions,
+# before they are trusted to classify without calling the model
+MEMO_MIN_CONFIDENCE = 0.85
+MEMO_MIN_HITS = 2
+MEMO_KEY_LENGTH = 40
+
+# Strict structured-output schema: only the fields we store, no free-text reasoning
+CLASSIFICATION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "classification",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "suggested_account_code": {"type": "string"},
+                "suggested_description": {"type": "string"},
+                "type": {"type": "string", "enum": ["receive", "spend", "transfer"]},
+                "confidence": {"type": "number"}
+            },
+            "required": ["suggested_account_code", "suggested_description", "type", "confidence"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Set once pharma.tx_classification_memo is known to exist; it is created by
+# scripts/migrate_classification_memo.py, not by the web service
+_memo_table_present = False
+
+_DIGITS = re.compile(r'[0-9]+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_description_key(description: Optional[str]) -> str:
+    """
+    Memo key for a bank description.
+    
+    Digits are stripped (dates, invoice and card numbers), whitespace is
+    collapsed and the result upper-cased and cut to MEMO_KEY_LENGTH chars.
+    Must stay in step with the SQL in scripts/refresh_classification_memo.py.
+    """
+    key = _WHITESPACE.sub(' ', _DIGITS.sub('', description or '')).strip().upper()
+    return key[:MEMO_KEY_LENGTH]
+
+
+def _memo_available(cur) -> bool:
+    """Whether the memo table exists; while it is missing, classification skips the memo"""
+    global _memo_table_present
+    if not _memo_table_present:
+        cur.execute("SELECT to_regclass('pharma.tx_classification_memo') IS NOT NULL AS present")
+        _memo_table_present = cur.fetchone()['present']
+    return _memo_table_present
+
 
 class BankAiClassifier:
     """AI service for classifying bank transactions"""
@@ -22,16 +82,10 @@ class BankAiClassifier:
         Returns:
             ai_suggestion_id if suggestion was created, None otherwise
         """
-        try:
-            import openai
-        except ImportError:
-            logger.error("OpenAI library not installed. Install with: pip install openai")
-            return None
-        
         with conn.cursor() as cur:
             # Get transaction
             cur.execute("""
-                SELECT id, pharmacy_id, date, description, reference, amount
+                SELECT id, pharmacy_id, date, description, reference, amount, classification_status
                 FROM pharma.bank_transactions
                 WHERE id = %s
             """, (transaction_id,))
@@ -44,150 +98,302 @@ class BankAiClassifier:
             if txn.get('classification_status') != 'unclassified':
                 return None
             
-            # Get available accounts for this pharmacy
-            cur.execute("""
-                SELECT id, code, name, type, category
-                FROM pharma.accounts
-                WHERE is_active = true
-                ORDER BY code
-            """)
+            accounts = BankAiClassifier._load_accounts(cur)
+            memo = BankAiClassifier._memo_lookup(cur, [txn])
+        
+        accounts_block = BankAiClassifier._accounts_block_for(accounts)
+        suggestion = BankAiClassifier._suggest(txn, accounts, accounts_block, memo)
+        if not suggestion:
+            return None
+        
+        try:
+            with conn.cursor() as cur:
+                suggestion_id = BankAiClassifier._save_suggestions(cur, [suggestion])[0]
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error saving AI suggestion for transaction {transaction_id}: {str(e)}")
+            conn.rollback()
+            return None
+        
+        logger.info(f"Created AI suggestion {suggestion_id} for transaction {transaction_id}")
+        return suggestion_id
+    
+    @staticmethod
+    def _load_accounts(cur) -> List[Dict[str, Any]]:
+        """Get available accounts for classification"""
+        cur.execute("""
+            SELECT id, code, name, type, category
+            FROM pharma.accounts
+            WHERE is_active = true
+            ORDER BY code
+        """)
+        return cur.fetchall()
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def _accounts_block(accounts_key: tuple) -> str:
+        """
+        Compact accounts table for the prompt, one `code|name|type|category` line per account.
+        
+        Pipe-delimited because account names contain commas (e.g. "Property, Plant & Equipment").
+        Cached on the (code, name, type, category) tuples, so the block is built
+        once and reused until the chart of accounts changes.
+        """
+        return "code|name|type|category\n" + "\n".join(
+            f"{code}|{name}|{type_}|{category}"
+            for code, name, type_, category in accounts_key
+        )
+    
+    @staticmethod
+    def _accounts_block_for(accounts: List[Dict[str, Any]]) -> str:
+        """Get the (cached) prompt accounts block for loaded account rows"""
+        return BankAiClassifier._accounts_block(tuple(
+            (acc['code'], acc['name'], acc['type'], acc['category']) for acc in accounts
+        ))
+    
+    @staticmethod
+    def _memo_lookup(cur, txns: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Get trusted memo entries for the given transactions, keyed by norm_key"""
+        keys = list({normalize_description_key(txn.get('description')) for txn in txns} - {''})
+        if not keys or not _memo_available(cur):
+            return {}
+        
+        # Entries pointing at a since-deactivated account fall through to the model
+        cur.execute("""
+            SELECT m.norm_key, m.account_id, m.confidence, m.n_hits
+            FROM pharma.tx_classification_memo m
+            JOIN pharma.accounts a ON a.id = m.account_id AND a.is_active
+            WHERE m.norm_key = ANY(%s)
+            AND m.confidence > %s
+            AND m.n_hits >= %s
+        """, (keys, MEMO_MIN_CONFIDENCE, MEMO_MIN_HITS))
+        return {row['norm_key']: row for row in cur.fetchall()}
+    
+    @staticmethod
+    def _suggest(txn: Dict[str, Any], accounts: List[Dict[str, Any]], accounts_block: str,
+                 memo: Dict[str, Dict[str, Any]]) -> Optional[tuple]:
+        """Classify from the memo when possible, otherwise ask the model"""
+        hit = memo.get(normalize_description_key(txn.get('description')))
+        if not hit:
+            return BankAiClassifier._classify(txn, accounts, accounts_block)
+        
+        amount = float(txn.get('amount') or 0)
+        raw_response = {'source': 'memo', 'norm_key': hit['norm_key'], 'n_hits': hit['n_hits']}
+        return (
+            txn['pharmacy_id'],
+            txn['id'],
+            hit['account_id'],
+            txn.get('description'),
+            'receive' if amount > 0 else 'spend',
+            'memo',
+            orjson.dumps(raw_response).decode(),
+            float(hit['confidence']),
+            'pending'
+        )
+    
+    @staticmethod
+    def record_accepted(cur, description: Optional[str], account_id: int) -> None:
+        """
+        Fold an accepted classification into the memo. Does not commit.
+        
+        Confidence is kept as the running share of accepts that agreed with the
+        memo's account; the nightly refresh cron re-picks the majority account.
+        A no-op until the memo table has been created.
+        """
+        norm_key = normalize_description_key(description)
+        if not norm_key or not _memo_available(cur):
+            return
+        
+        cur.execute("""
+            INSERT INTO pharma.tx_classification_memo AS m (norm_key, account_id, confidence, n_hits)
+            VALUES (%s, %s, 1, 1)
+            ON CONFLICT (norm_key) DO UPDATE
+            SET confidence = CASE
+                    WHEN m.account_id = EXCLUDED.account_id
+                    THEN (m.confidence * m.n_hits + 1) / (m.n_hits + 1)
+                    ELSE (m.confidence * m.n_hits) / (m.n_hits + 1)
+                END,
+                n_hits = m.n_hits + 1,
+                updated_at = now()
+        """, (norm_key, account_id))
+    
+    @staticmethod
+    def _classify(txn: Dict[str, Any], accounts: List[Dict[str, Any]],
+                  accounts_block: str) -> Optional[tuple]:
+        """
+        Ask the model to classify an already-loaded transaction row.
+        
+        Does not touch the database; the caller persists the result.
+        
+        Returns:
+            ai_suggestions insert params tuple, or None if no usable suggestion
+        """
+        try:
+            import openai
+        except ImportError:
+            logger.error("OpenAI library not installed. Install with: pip install openai")
+            return None
+        
+        transaction_id = txn['id']
+        
+        # Build prompt
+        prompt = BankAiClassifier._build_classification_prompt(txn, accounts_block)
+        
+        # Call OpenAI
+        try:
+            # Get API key from environment
+            import os
+            api_key = os.getenv('OPENAI_API_KEY')
+            if not api_key:
+                logger.warning("OPENAI_API_KEY not set. Skipping AI classification.")
+                return None
             
-            accounts = cur.fetchall()
+            client = openai.OpenAI(api_key=api_key)
             
-            # Build prompt
-            prompt = BankAiClassifier._build_classification_prompt(txn, accounts)
+            response = client.chat.completions.create(
+                model="gpt-4o-mini",  # Use cheaper model for classification
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are an accounting assistant that classifies bank transactions into appropriate chart of accounts categories. Return your response as valid JSON."
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                response_format=CLASSIFICATION_RESPONSE_FORMAT,
+                temperature=0.3
+            )
             
-            # Call OpenAI
-            try:
-                # Get API key from environment
-                import os
-                api_key = os.getenv('OPENAI_API_KEY')
-                if not api_key:
-                    logger.warning("OPENAI_API_KEY not set. Skipping AI classification.")
-                    return None
-                
-                client = openai.OpenAI(api_key=api_key)
-                
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",  # Use cheaper model for classification
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are an accounting assistant that classifies bank transactions into appropriate chart of accounts categories. Return your response as valid JSON."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    response_format={"type": "json_object"},
-                    temperature=0.3
-                )
-                
-                result = json.loads(response.choices[0].message.content)
-                
-                # Extract suggestion
-                suggested_account_code = result.get('suggested_account_code')
-                suggested_description = result.get('suggested_description')
-                suggested_type = result.get('type', 'spend')  # 'receive', 'spend', 'transfer'
-                confidence = result.get('confidence', 0.5)
-                
-                # Find account by code
-                suggested_account_id = None
-                for account in accounts:
-                    if account['code'] == suggested_account_code:
-                        suggested_account_id = account['id']
-                        break
-                
-                if not suggested_account_id:
-                    logger.warning(f"Could not find account with code {suggested_account_code}")
-                    return None
-                
-                # Save suggestion
-                cur.execute("""
-                    INSERT INTO pharma.ai_suggestions
-                    (pharmacy_id, bank_transaction_id, suggested_account_id, suggested_description,
-                     suggested_type, model_name, raw_response, confidence, status)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                """, (
-                    txn['pharmacy_id'],
-                    transaction_id,
-                    suggested_account_id,
-                    suggested_description,
-                    suggested_type,
-                    'gpt-4o-mini',
-                    json.dumps(result),
-                    confidence,
-                    'pending'
-                ))
-                
-                suggestion = cur.fetchone()
-                suggestion_id = suggestion['id']
-                
-                # Update transaction
-                cur.execute("""
-                    UPDATE pharma.bank_transactions
-                    SET classification_status = 'ai_classified',
-                        ai_suggestion_id = %s
-                    WHERE id = %s
-                """, (suggestion_id, transaction_id))
-                
-                conn.commit()
-                logger.info(f"Created AI suggestion {suggestion_id} for transaction {transaction_id}")
-                return suggestion_id
-                
-            except Exception as e:
-                logger.error(f"Error calling OpenAI API: {str(e)}")
-                conn.rollback()
-                return None
+            result = orjson.loads(response.choices[0].message.content)
+        except Exception as e:
+            logger.error(f"Error calling OpenAI API for transaction {transaction_id}: {str(e)}")
+            return None
+        
+        # Extract suggestion
+        suggested_account_code = result.get('suggested_account_code')
+        suggested_description = result.get('suggested_description')
+        suggested_type = result.get('type', 'spend')  # 'receive', 'spend', 'transfer'
+        try:
+            confidence = float(result.get('confidence', 0.5))
+        except (TypeError, ValueError):
+            confidence = 0.5
+        # The schema leaves the number unbounded, but the column is CHECKed to [0, 1]
+        confidence = min(max(confidence, 0.0), 1.0)
+        
+        # Find account by code
+        suggested_account_id = None
+        for account in accounts:
+            if account['code'] == suggested_account_code:
+                suggested_account_id = account['id']
+                break
+        
+        if not suggested_account_id:
+            logger.warning(f"Could not find account with code {suggested_account_code}")
+            return None
+        
+        return (
+            txn['pharmacy_id'],
+            transaction_id,
+            suggested_account_id,
+            suggested_description,
+            suggested_type,
+            'gpt-4o-mini',
+            orjson.dumps(result).decode(),
+            confidence,
+            'pending'
+        )
     
     @staticmethod
-    def _build_classification_prompt(transaction: Dict[str, Any], accounts: List[Dict[str, Any]]) -> str:
-        """Build the prompt for AI classification"""
+    def _save_suggestions(cur, suggestions: List[tuple]) -> List[int]:
+        """
+        Insert suggestions and link them to their transactions. Does not commit.
+        
+        The whole chunk is written in one round-trip: the rows are passed as
+        parallel arrays, inserted via unnest(), and the RETURNING ids feed the
+        bank_transactions update in the same statement.
         
-        # Format accounts list
-        accounts_list = []
-        for acc in accounts:
-            accounts_list.append(f"- Code: {acc['code']}, Name: {acc['name']}, Type: {acc['type']}, Category: {acc['category']}")
+        Returns:
+            ai_suggestion ids in the same order as `suggestions`
+        """
+        columns = list(zip(*suggestions))
+        cur.execute("""
+            WITH data AS (
+                SELECT * FROM unnest(
+                    %s::integer[], %s::bigint[], %s::bigint[], %s::text[],
+                    %s::text[], %s::text[], %s::text[], %s::numeric[], %s::text[]
+                ) AS d(pharmacy_id, bank_transaction_id, suggested_account_id, suggested_description,
+                       suggested_type, model_name, raw_response, confidence, status)
+            ), inserted AS (
+                INSERT INTO pharma.ai_suggestions
+                (pharmacy_id, bank_transaction_id, suggested_account_id, suggested_description,
+                 suggested_type, model_name, raw_response, confidence, status)
+                SELECT pharmacy_id, bank_transaction_id, suggested_account_id, suggested_description,
+                       suggested_type::pharma.bank_rule_type, model_name, raw_response::jsonb,
+                       confidence, status::pharma.ai_suggestion_status
+                FROM data
+                RETURNING id, bank_transaction_id
+            )
+            UPDATE pharma.bank_transactions t
+            SET classification_status = 'ai_classified',
+                ai_suggestion_id = inserted.id
+            FROM inserted
+            WHERE t.id = inserted.bank_transaction_id
+            RETURNING inserted.id, inserted.bank_transaction_id
+        """, [list(column) for column in columns])
         
-        accounts_text = "\n".join(accounts_list)
+        ids_by_transaction = {row['bank_transaction_id']: row['id'] for row in cur.fetchall()}
+        return [ids_by_transaction[params[1]] for params in suggestions]
+    
+    @staticmethod
+    def _save_suggestions_one_by_one(conn, suggestions: List[tuple]) -> int:
+        """
+        Fallback after a chunk failed to save: insert each suggestion under its own
+        savepoint so one bad row doesn't discard the rest of the chunk's results.
+        Commits.
+        
+        Returns:
+            number of suggestions saved
+        """
+        saved = 0
+        with conn.transaction():
+            for suggestion in suggestions:
+                try:
+                    with conn.transaction(), conn.cursor() as cur:
+                        BankAiClassifier._save_suggestions(cur, [suggestion])
+                    saved += 1
+                except Exception as e:
+                    logger.warning(f"Could not save AI suggestion for transaction {suggestion[1]}: {str(e)}")
+        return saved
+    
+    @staticmethod
+    def _build_classification_prompt(transaction: Dict[str, Any], accounts_block: str) -> str:
+        """Build the prompt for AI classification from a prebuilt accounts block"""
         
         # Determine amount direction
         amount = float(transaction.get('amount', 0))
         amount_str = f"R {abs(amount):,.2f}"
         if amount > 0:
-            direction = "Money IN (credit)"
+            direction = "IN"
         else:
-            direction = "Money OUT (debit)"
+            direction = "OUT"
         
-        prompt = f"""Classify the following bank transaction into the most appropriate chart of accounts account.
-
-Transaction Details:
-- Date: {transaction.get('date')}
-- Description: {transaction.get('description', '')}
-- Reference: {transaction.get('reference', 'N/A')}
-- Amount: {amount_str} ({direction})
-
-Available Accounts:
-{accounts_text}
-
-Return a JSON object with the following structure:
-{{
-  "suggested_account_code": "string (the account code from the list above)",
-  "suggested_description": "string (cleaned/standardized description for the ledger)",
-  "type": "receive|spend|transfer",
-  "confidence": 0.0-1.0,
-  "reasoning": "brief explanation of why this account was chosen"
-}}
+        description = (transaction.get('description') or '')[:MAX_DESCRIPTION_CHARS]
+        
+        # Accounts go first so the shared prefix is identical across calls
+        # and eligible for OpenAI prompt caching
+        prompt = f"""Accounts:
+{accounts_block}
 
-Choose the most appropriate account based on:
-1. The transaction description and reference
-2. The account type and category
-3. Whether money is coming in or going out
+Classify this bank transaction into one account code from the list.
+Money IN usually maps to INCOME, OTHER_INCOME or ASSET; money OUT to EXPENSE, COGS or ASSET.
+Give the account code, a clean ledger description, the type and a 0-1 confidence.
 
-For money IN (positive amounts), typically use INCOME, OTHER_INCOME, or ASSET accounts.
-For money OUT (negative amounts), typically use EXPENSE, COGS, or ASSET accounts."""
+Date: {transaction.get('date')}
+Description: {description}
+Reference: {transaction.get('reference') or 'N/A'}
+Amount: {amount_str} {direction}"""
         
         return prompt
     
@@ -202,25 +408,57 @@ For money OUT (negative amounts), typically use EXPENSE, COGS, or ASSET accounts
                 'suggestions_created': int
             }
         """
+        unclassified_before = 0
+        suggestions_created = 0
+        
         with conn.cursor() as cur:
-            # Get unclassified transactions
-            cur.execute("""
-                SELECT id FROM pharma.bank_transactions
-                WHERE bank_import_batch_id = %s
-                AND classification_status = 'unclassified'
-            """, (batch_id,))
-            
-            transactions = cur.fetchall()
-            unclassified_before = len(transactions)
-            suggestions_created = 0
+            accounts = BankAiClassifier._load_accounts(cur)
+        accounts_block = BankAiClassifier._accounts_block_for(accounts)
+        
+        # Page through unclassified transactions by id (keyset pagination), so the
+        # batch is never materialized and each page is read on a plain cursor.
+        # Writes are committed once per chunk; if we crash mid-batch the
+        # remaining transactions stay unclassified and can simply be re-run.
+        last_id = 0
+        while True:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT id, pharmacy_id, date, description, reference, amount, classification_status
+                    FROM pharma.bank_transactions
+                    WHERE bank_import_batch_id = %s
+                    AND classification_status = 'unclassified'
+                    AND id > %s
+                    ORDER BY id
+                    LIMIT %s
+                """, (batch_id, last_id, CHUNK_SIZE))
+                chunk = cur.fetchall()
+                if not chunk:
+                    break
+                # Rows of a chunk that fails to save stay unclassified but are not retried here
+                last_id = chunk[-1]['id']
+                unclassified_before += len(chunk)
+                memo = BankAiClassifier._memo_lookup(cur, chunk)
             
-            for txn in transactions:
-                suggestion_id = BankAiClassifier.suggest_for_transaction(conn, txn['id'])
-                if suggestion_id:
-                    suggestions_created += 1
+            suggestions = [
+                suggestion for suggestion in
+                (BankAiClassifier._suggest(txn, accounts, accounts_block, memo) for txn in chunk)
+                if suggestion
+            ]
+            if not suggestions:
+                continue
             
-            return {
-                'unclassified_before': unclassified_before,
-                'suggestions_created': suggestions_created
-            }
+            try:
+                with conn.cursor() as cur:
+                    BankAiClassifier._save_suggestions(cur, suggestions)
+                conn.commit()
+                suggestions_created += len(suggestions)
+            except Exception as e:
+                logger.error(f"Error saving AI suggestions for batch {batch_id}: {str(e)}")
+                conn.rollback()
+                suggestions_created += BankAiClassifier._save_suggestions_one_by_one(conn, suggestions)
+        
+        return {
+            'unclassified_before': unclassified_before,
+            'suggestions_created': suggestions_created
+        }
 
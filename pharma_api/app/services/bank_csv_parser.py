@@ -4,11 +4,12 @@ Parses CSV files from banks into standardized format.
 Based on Ruby implementation for consistency.
 """
 
+import codecs
 import csv
 import io
 import re
 from datetime import datetime, date
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from decimal import Decimal, InvalidOperation
 try:
     from dateutil import parser as date_parser
@@ -16,12 +17,88 @@ try:
 except ImportError:
     DATEUTIL_AVAILABLE = False
 
+# Supported date formats, DD/MM/YYYY first (most common in South Africa)
+DATE_FORMATS = (
+    '%d/%m/%Y',      # 29/11/2025
+    '%d-%m-%Y',      # 29-11-2025
+    '%Y-%m-%d',      # 2025-11-29 (ISO)
+    '%Y/%m/%d',      # 2025/11/29
+    '%d/%m/%y',      # 29/11/25
+    '%d-%m-%y',      # 29-11-25
+    '%d.%m.%Y',      # 29.11.2025
+    '%Y.%m.%d',      # 2025.11.29
+    '%d %b %Y',      # 29 Nov 2025
+    '%d %B %Y',      # 29 November 2025
+    '%d %b %y',      # 29 Nov 25
+    '%d-%b-%Y',      # 29-Nov-2025
+    '%d-%b-%y',      # 29-Nov-25
+    '%b %d, %Y',     # Nov 29, 2025
+)
+_DATE_FORMAT_SET = frozenset(DATE_FORMATS)
+
+def detect_encoding(content: bytes) -> str:
+    """
+    UTF-8 (BOM-aware) if the whole file is valid UTF-8, otherwise Latin-1.
+    
+    Validated chunk by chunk with an incremental decoder so no decoded
+    copy of the file is kept.
+    """
+    # Most exports are plain ASCII; bytes.isascii() settles that in one
+    # word-at-a-time C scan without running the UTF-8 decoder at all
+    if content.isascii():
+        return 'utf-8-sig'
+    
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    view = memoryview(content)
+    try:
+        for start in range(0, len(view), DECODE_CHUNK_SIZE):
+            decoder.decode(view[start:start + DECODE_CHUNK_SIZE])
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        # Latin-1 maps every byte, so it cannot fail
+        return 'latin-1'
+    return 'utf-8-sig'
+
+
+def normalize_description(desc: str) -> str:
+    """Trim, collapse whitespace runs to one space and uppercase"""
+    # str.split() handles all Unicode whitespace in C, no regex needed
+    return ' '.join(desc.split()).upper()
+
+
+# Bytes validated per step when checking a file is UTF-8
+DECODE_CHUNK_SIZE = 64 * 1024
+# Leading bytes inspected when sniffing the delimiter
+SNIFF_BYTES = 512
+
+# Spaces and currency symbols dropped from amounts
+_AMOUNT_STRIP = str.maketrans('', '', ' R$€£')
+# Amounts already in Decimal's own notation, e.g. "-1234.56"
+_PLAIN_AMOUNT_RE = re.compile(r'-?\d+(?:\.\d+)?', re.ASCII)
+
+# Time of day some exports append to the date, e.g. "2025-11-29 10:30:00"
+_TRAILING_TIME_RE = re.compile(r'[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?$')
+_DMY_DATE_RE = re.compile(r'^(\d{1,2})[/-](\d{1,2})[/-](\d{4})$')
+_FOUR_DIGITS_RE = re.compile(r'\d{4}')
+
+
+def row_dict(fieldnames: List[str], values: List[str]) -> Dict:
+    """Header -> value dict for raw_data, shaped like a csv.DictReader row"""
+    row = dict(zip(fieldnames, values))
+    if len(values) < len(fieldnames):
+        for name in fieldnames[len(values):]:
+            row[name] = None
+    elif len(values) > len(fieldnames):
+        row[None] = values[len(fieldnames):]
+    return row
+
 
 class ParsedRow:
     """Represents a successfully parsed CSV row"""
     def __init__(self, row_number: int, date: date, description: str, 
                  raw_description: str, reference: Optional[str], 
-                 amount: Decimal, balance: Optional[Decimal], raw_data: Dict):
+                 amount: Decimal, balance: Optional[Decimal],
+                 raw_values: List[str], fieldnames: List[str]):
         self.row_number = row_number
         self.date = date
         self.description = description
@@ -29,7 +106,14 @@ class ParsedRow:
         self.reference = reference
         self.amount = amount
         self.balance = balance
-        self.raw_data = raw_data
+        # Keep the reader's cell list and the shared header; the dict is
+        # only built when raw_data is actually read
+        self.raw_values = raw_values
+        self.fieldnames = fieldnames
+    
+    @property
+    def raw_data(self) -> Dict:
+        return row_dict(self.fieldnames, self.raw_values)
 
 
 class ParseError:
@@ -48,6 +132,56 @@ class ParseResult:
         self.summary = summary
 
 
+class ParseStream:
+    """
+    Rows of a CSV file, parsed while being iterated.
+    errors and summary are complete once iteration has finished.
+    """
+    def __init__(self, parser: 'BankCsvParser'):
+        self._parser = parser
+        self.errors: List[ParseError] = []
+        self.summary: Dict = {}
+    
+    def __iter__(self) -> Iterator[ParsedRow]:
+        return self._parser._iter_parse(self)
+
+
+class _SummaryBuilder:
+    """Running count, totals and period range for a parse summary"""
+    def __init__(self):
+        # Summary totals only; row amounts stay Decimal
+        self.count = 0
+        self.total_in = 0.0
+        self.total_out = 0.0
+        self.min_date = None
+        self.max_date = None
+    
+    def add(self, parsed: ParsedRow):
+        self.count += 1
+        
+        # Update totals
+        amount = float(parsed.amount)
+        if amount > 0:
+            self.total_in += amount
+        elif amount < 0:
+            self.total_out += amount
+        
+        # Update period range
+        if self.min_date is None or parsed.date < self.min_date:
+            self.min_date = parsed.date
+        if self.max_date is None or parsed.date > self.max_date:
+            self.max_date = parsed.date
+    
+    def result(self) -> Dict:
+        return {
+            "transaction_count": self.count,
+            "total_in": round(self.total_in, 2),
+            "total_out": round(abs(self.total_out), 2),  # Return as positive number (absolute value)
+            "min_date": self.min_date.isoformat() if self.min_date else None,
+            "max_date": self.max_date.isoformat() if self.max_date else None
+        }
+
+
 class BankCsvParser:
     """Parser for bank CSV files"""
     
@@ -65,226 +199,303 @@ class BankCsvParser:
         parser = BankCsvParser(file_content)
         return parser._parse()
     
+    @staticmethod
+    def iter_parse(file_content: bytes) -> ParseStream:
+        """
+        Parse a CSV file lazily.
+        
+        Rows are parsed as the returned stream is iterated, so a caller that
+        consumes them in chunks never holds every parsed row at once,
+        whatever the file size.
+        
+        Args:
+            file_content: Raw CSV file bytes
+        
+        Returns:
+            ParseStream of ParsedRow; its errors and summary fill in as it is consumed
+        """
+        return ParseStream(BankCsvParser(file_content))
+    
     def __init__(self, file_content: bytes):
         self.file_content = file_content
+        # Statements repeat the same few dates on many rows
+        self._date_cache: Dict[str, date] = {}
+        self._preferred_date_fmt: Optional[str] = None
     
     def _parse(self) -> ParseResult:
         """Main parsing logic"""
-        rows = []
-        errors = []
-        
-        row_number = 0
-        total_in = Decimal("0")
-        total_out = Decimal("0")
-        min_date = None
-        max_date = None
+        rows, errors = self._collect(self._records(self._csv_enum()))
         
-        csv_enum = self._csv_enum()
+        summary = _SummaryBuilder()
+        for parsed in rows:
+            summary.add(parsed)
         
-        for raw_row in csv_enum:
-            row_number += 1
-            
-            # Skip completely empty rows
-            if self._is_empty_row(raw_row):
-                continue
-            
+        return ParseResult(rows=rows, errors=errors, summary=summary.result())
+    
+    def _iter_parse(self, stream: ParseStream) -> Iterator[ParsedRow]:
+        """Yield parsed rows for a ParseStream, filling its errors and summary"""
+        summary = _SummaryBuilder()
+        for parsed in self._parse_records(self._records(self._csv_enum()), stream.errors):
+            summary.add(parsed)
+            yield parsed
+        stream.summary = summary.result()
+    
+    def _parse_records(self, records, errors: List[ParseError]) -> Iterator[ParsedRow]:
+        """Parse (row_number, values) records, yielding rows and appending errors"""
+        for row_number, values in records:
             try:
-                parsed = self._parse_row(row_number, raw_row)
-                rows.append(parsed)
-                
-                # Update totals
-                if parsed.amount > 0:
-                    total_in += parsed.amount
-                elif parsed.amount < 0:
-                    total_out += parsed.amount
-                
-                # Update period range
-                if min_date is None or parsed.date < min_date:
-                    min_date = parsed.date
-                if max_date is None or parsed.date > max_date:
-                    max_date = parsed.date
-                    
+                parsed = self._parse_row(row_number, values)
             except Exception as e:
                 errors.append(ParseError(
                     row_number=row_number,
                     error=str(e),
-                    raw_data=dict(raw_row)
+                    raw_data=row_dict(self._fieldnames, values)
                 ))
-        
-        summary = {
-            "transaction_count": len(rows),
-            "total_in": float(total_in),
-            "total_out": abs(float(total_out)),  # Return as positive number (absolute value)
-            "min_date": min_date.isoformat() if min_date else None,
-            "max_date": max_date.isoformat() if max_date else None
-        }
-        
-        return ParseResult(rows=rows, errors=errors, summary=summary)
+                continue
+            yield parsed
+    
+    def _collect(self, records) -> Tuple[List[ParsedRow], List[ParseError]]:
+        """Parse (row_number, values) records into rows and errors"""
+        errors = []
+        rows = list(self._parse_records(records, errors))
+        return rows, errors
+    
+    def _records(self, csv_enum):
+        """Yield (row_number, values) for each non-empty data row"""
+        row_number = 0
+        for values in csv_enum:
+            # Blank lines are not counted, matching csv.DictReader numbering
+            if not values:
+                continue
+            row_number += 1
+            
+            # Skip completely empty rows
+            if self._is_empty_row(values):
+                continue
+            
+            yield row_number, values
     
     def _csv_enum(self):
         """Create CSV reader with proper encoding and separator detection"""
-        # Decode file content
-        try:
-            content = self.file_content.decode('utf-8-sig')  # Handle BOM
-        except UnicodeDecodeError:
-            try:
-                content = self.file_content.decode('latin-1')
-            except UnicodeDecodeError:
-                raise ValueError("Unable to decode file. Expected UTF-8 or Latin-1 encoding.")
+        # Rows are decoded lazily as the reader consumes them, so the file is
+        # never held as bytes and a full str copy at the same time
+        encoding = detect_encoding(self.file_content)
+        text = io.TextIOWrapper(io.BytesIO(self.file_content), encoding=encoding, newline='')
         
         # Detect separator
-        delimiter = self._detect_separator(content)
+        delimiter = self._detect_separator(self.file_content)
         
-        # Create CSV reader
-        reader = csv.DictReader(io.StringIO(content), delimiter=delimiter)
+        # Create CSV reader; the header is resolved to column indices once
+        # so rows can be read as plain lists
+        reader = csv.reader(text, delimiter=delimiter)
+        self._resolve_columns(next(reader, None) or [])
         return reader
     
-    def _detect_separator(self, content: str) -> str:
+    def _resolve_columns(self, fieldnames: List[str]):
+        """Map the header (case-insensitively) to the column indices each field is read from"""
+        self._fieldnames = fieldnames
+        lower = [name.lower() for name in fieldnames]
+        
+        # Last column wins for exact names, like a lower-cased dict of the row would
+        exact = {name: i for i, name in enumerate(lower)}
+        self._date_idx = exact.get('date')
+        self._description_idx = exact.get('description')
+        self._balance_idx = exact.get('balance')
+        self._reference_idx = exact.get('reference')
+        
+        # Candidate columns for amounts, tried in header order per row
+        self._debit_idxs = [i for i, name in enumerate(lower) if 'debit' in name]
+        self._credit_idxs = [i for i, name in enumerate(lower) if 'credit' in name]
+        if 'withdrawal' in exact:
+            self._debit_idxs.append(exact['withdrawal'])
+        if 'deposit' in exact:
+            self._credit_idxs.append(exact['deposit'])
+        self._amount_idxs = [
+            i for i, name in enumerate(lower)
+            if 'amount' in name and name not in ['debit', 'credit', 'amount debit', 'amount credit']
+        ]
+    
+    @staticmethod
+    def _field(values: List[str], index: Optional[int]) -> Optional[str]:
+        """Value at a resolved column index, or None if the column is absent"""
+        if index is None or index >= len(values):
+            return None
+        return values[index]
+    
+    @staticmethod
+    def _first_value(values: List[str], indices: List[int]) -> Optional[str]:
+        """First non-blank value among candidate columns"""
+        for index in indices:
+            if index < len(values):
+                value = values[index]
+                if value and value.strip():
+                    return value
+        return None
+    
+    def _detect_separator(self, content: bytes) -> str:
         """Detect CSV separator (comma or semicolon)"""
-        first_line = content.split('\n')[0] if content else ""
-        if first_line.count(';') > first_line.count(','):
+        # Both separators are ASCII, so the raw header gives the same counts;
+        # only a bounded prefix is looked at however long the first line is
+        first_line = content[:SNIFF_BYTES].split(b'\n', 1)[0]
+        if first_line.count(b';') > first_line.count(b','):
             return ';'
         return ','
     
-    def _is_empty_row(self, row: Dict) -> bool:
+    def _is_empty_row(self, values: List[str]) -> bool:
         """Check if row is completely empty"""
-        return all(not v or str(v).strip() == '' for v in row.values())
+        # One join/strip in C instead of a Python-level loop over the cells
+        return not ''.join(values).strip()
     
-    def _parse_row(self, row_number: int, row: Dict) -> ParsedRow:
+    def _parse_row(self, row_number: int, values: List[str]) -> ParsedRow:
         """Parse a single CSV row"""
-        # Case-insensitive field access
-        row_lower = {k.lower(): v for k, v in row.items()}
+        # Extra cells usually mean an unquoted separator inside a value
+        if len(values) > len(self._fieldnames):
+            raise ValueError("Row has more fields than the header")
         
-        date_str = row_lower.get('date') or row.get('Date') or row.get('date')
-        description_str = row_lower.get('description') or row.get('Description') or row.get('description')
-        balance_str = row_lower.get('balance') or row.get('Balance')
-        reference_str = row_lower.get('reference') or row.get('Reference')
+        date_str = self._field(values, self._date_idx)
+        description_str = self._field(values, self._description_idx)
+        balance_str = self._field(values, self._balance_idx)
+        reference_str = self._field(values, self._reference_idx)
+        # csv.reader cells are always str, so no str() casts are needed below
         
         # Validate required fields
-        if not date_str or str(date_str).strip() == '':
+        if not date_str or not date_str.strip():
             raise ValueError("Missing Date")
-        if not description_str or str(description_str).strip() == '':
+        if not description_str or not description_str.strip():
             raise ValueError("Missing Description")
         
         # Parse amount - handle both single "amount" field and separate "debit"/"credit" columns
-        parsed_amount = self._parse_amount_from_row(row, row_lower)
+        parsed_amount = self._parse_amount_from_row(values)
         if parsed_amount is None:
             raise ValueError("Missing Amount (no amount, debit, or credit field found)")
         
         # Parse fields
-        parsed_date = self._parse_date(str(date_str))
-        parsed_balance = self._parse_amount(str(balance_str)) if balance_str and str(balance_str).strip() else None
+        parsed_date = self._parse_date(date_str)
+        parsed_balance = self._parse_amount(balance_str) if balance_str and balance_str.strip() else None
         
         return ParsedRow(
             row_number=row_number,
             date=parsed_date,
-            description=self._normalize_description(str(description_str)),
-            raw_description=str(description_str),
-            reference=str(reference_str).strip() if reference_str else None,
+            description=self._normalize_description(description_str),
+            raw_description=description_str,
+            reference=reference_str.strip() if reference_str else None,
             amount=parsed_amount,
             balance=parsed_balance,
-            raw_data=dict(row)
+            raw_values=values,
+            fieldnames=self._fieldnames
         )
     
-    def _parse_amount_from_row(self, row: Dict, row_lower: Dict) -> Optional[Decimal]:
+    def _parse_amount_from_row(self, values: List[str]) -> Optional[Decimal]:
         """
         Parse amount from row, handling both single "amount" field and separate "debit"/"credit" columns.
         Returns positive for credits (money in), negative for debits (money out).
         """
         # First, try separate debit/credit columns (case-insensitive)
-        debit_str = None
-        credit_str = None
-        
-        # Check for debit field
-        for key in row_lower.keys():
-            if 'debit' in key.lower() and row_lower[key] and str(row_lower[key]).strip():
-                debit_str = str(row_lower[key])
-                break
-        
-        # Check for credit field
-        for key in row_lower.keys():
-            if 'credit' in key.lower() and row_lower[key] and str(row_lower[key]).strip():
-                credit_str = str(row_lower[key])
-                break
-        
-        # Also check common variations
-        if not debit_str:
-            debit_str = row_lower.get('debit') or row_lower.get('withdrawal') or row_lower.get('amount debit')
-        if not credit_str:
-            credit_str = row_lower.get('credit') or row_lower.get('deposit') or row_lower.get('amount credit')
+        debit_str = self._first_value(values, self._debit_idxs)
+        credit_str = self._first_value(values, self._credit_idxs)
         
         # If we have separate debit/credit columns, use them
         # Check which one has a value (typically only one will be filled per row)
-        if debit_str and str(debit_str).strip():
+        if debit_str:
             try:
-                debit_amount = self._parse_amount(str(debit_str))
+                debit_amount = self._parse_amount(debit_str)
                 if debit_amount is not None and debit_amount != 0:
                     return -abs(debit_amount)  # Negative for debits (money out)
             except (ValueError, InvalidOperation):
                 pass  # Try credit or fallback to amount field
         
-        if credit_str and str(credit_str).strip():
+        if credit_str:
             try:
-                credit_amount = self._parse_amount(str(credit_str))
+                credit_amount = self._parse_amount(credit_str)
                 if credit_amount is not None and credit_amount != 0:
                     return abs(credit_amount)  # Positive for credits (money in)
             except (ValueError, InvalidOperation):
                 pass  # Fallback to amount field
         
         # Fall back to single "amount" field (case-insensitive)
-        amount_str = None
-        for key in row_lower.keys():
-            if 'amount' in key.lower() and key.lower() not in ['debit', 'credit', 'amount debit', 'amount credit']:
-                if row_lower[key] and str(row_lower[key]).strip():
-                    amount_str = str(row_lower[key])
-                    break
-        
-        # Also try exact matches
-        if not amount_str:
-            amount_str = row_lower.get('amount') or row.get('Amount') or row.get('amount')
-        
-        if amount_str and str(amount_str).strip():
+        amount_str = self._first_value(values, self._amount_idxs)
+        if amount_str:
             # Parse the amount - preserve sign if present
-            return self._parse_amount(str(amount_str))
+            return self._parse_amount(amount_str)
         
         return None
     
     def _parse_date(self, date_str: str) -> date:
         """
-        Parse date string. Tries DD/MM/YYYY first (most common in SA),
-        then falls back to other formats.
+        Parse date string. Tries the file's established format first,
+        then the other supported formats, then dateutil when installed.
         """
         s = date_str.strip()
+        cached = self._date_cache.get(s)
+        if cached is not None:
+            return cached
         
-        # Try DD/MM/YYYY first (most common in South Africa)
-        formats = [
-            '%d/%m/%Y',      # 29/11/2025
-            '%d-%m-%Y',      # 29-11-2025
-            '%Y-%m-%d',      # 2025-11-29 (ISO)
-            '%Y/%m/%d',      # 2025/11/29
-            '%d/%m/%y',      # 29/11/25
-            '%d-%m-%y',      # 29-11-25
-            '%d.%m.%Y',      # 29.11.2025
-            '%Y.%m.%d',      # 2025.11.29
-        ]
+        parsed = self._parse_date_uncached(s)
+        self._date_cache[s] = parsed
+        return parsed
+    
+    def _parse_date_uncached(self, s: str) -> date:
+        """Try each supported date format on a stripped date string"""
+        time_of_day = _TRAILING_TIME_RE.search(s)
+        if time_of_day:
+            s = s[:time_of_day.start()]
+        
+        # ISO dates go through the C parser instead of strptime
+        if len(s) == 10 and s[4] == '-' and s[7] == '-':
+            try:
+                return date.fromisoformat(s)
+            except ValueError:
+                pass
+        
+        # Fixed-width numeric dates name their format by where the separators sit
+        fmt = None
+        if len(s) == 10 and s[4] == s[7] and s[4] in '/.':
+            fmt = f'%Y{s[4]}%m{s[4]}%d'
+        elif len(s) in (8, 10) and s[2] == s[5] and s[2] in '/-.':
+            fmt = f'%d{s[2]}%m{s[2]}' + ('%Y' if len(s) == 10 else '%y')
+        elif len(s) == 8 and s.isdigit():
+            fmt = '%Y%m%d'  # 20251129; only tried on exactly eight digits
+        if fmt in _DATE_FORMAT_SET or fmt == '%Y%m%d':
+            try:
+                return datetime.strptime(s, fmt).date()
+            except ValueError:
+                pass
+        
+        # Files use one date format throughout, so the format that last
+        # matched is tried first and the rest only on a miss
+        preferred = self._preferred_date_fmt
+        if preferred:
+            try:
+                return datetime.strptime(s, preferred).date()
+            except ValueError:
+                pass
         
-        for fmt in formats:
+        for fmt in DATE_FORMATS:
+            if fmt == preferred:
+                continue
             try:
-                dt = datetime.strptime(s, fmt)
-                return dt.date()
+                parsed = datetime.strptime(s, fmt).date()
             except ValueError:
                 continue
+            self._preferred_date_fmt = fmt
+            return parsed
         
         # If dateutil is available, try flexible parsing
         if DATEUTIL_AVAILABLE:
             try:
-                dt = date_parser.parse(s, dayfirst=True)  # Prefer DD/MM/YYYY
-                return dt.date()
+                parsed = date_parser.parse(s, dayfirst=True).date()  # Prefer DD/MM/YYYY
             except (ValueError, TypeError, OverflowError):
                 pass
+            else:
+                if not _FOUR_DIGITS_RE.search(s):
+                    # Two-digit year: use strptime's %y pivot (69-99 -> 19xx, else 20xx)
+                    # rather than dateutil's sliding window, so both paths agree
+                    yy = parsed.year % 100
+                    parsed = parsed.replace(year=(1900 if yy >= 69 else 2000) + yy)
+                return parsed
         
         # Try regex-based parsing for DD/MM/YYYY
-        match = re.match(r'^(\d{1,2})[/-](\d{1,2})[/-](\d{4})$', s)
+        match = _DMY_DATE_RE.match(s)
         if match:
             day, month, year = match.groups()
             try:
@@ -298,13 +509,19 @@ class BankCsvParser:
         """
         Parse amount string. Handles various formats including commas, spaces, etc.
         """
-        s = str(amount_str).strip()
+        s = amount_str.strip()
         
-        # Remove spaces
-        s = s.replace(' ', '')
+        # Most exports use plain amounts that need none of the cleanup below
+        if _PLAIN_AMOUNT_RE.fullmatch(s):
+            return Decimal(s)
         
-        # Remove currency symbols
-        s = s.replace('R', '').replace('ZAR', '').replace('$', '').replace('€', '').replace('£', '')
+        # Remove "ZAR" before the single-character pass, which would otherwise
+        # strip its R and leave "ZA" behind
+        if 'ZAR' in s:
+            s = s.replace('ZAR', '')
+        
+        # Remove spaces and currency symbols in one pass
+        s = s.translate(_AMOUNT_STRIP)
         
         # Handle thousands separators
         # If there's a comma before the last 3 digits, it's likely a thousands separator
@@ -331,8 +548,4 @@ class BankCsvParser:
     
     def _normalize_description(self, desc_str: str) -> str:
         """Normalize description: trim, collapse spaces, uppercase"""
-        s = str(desc_str).strip()
-        # Collapse multiple spaces to single space
-        s = re.sub(r'\s+', ' ', s)
-        return s.upper()
-
+        return normalize_description(desc_str)
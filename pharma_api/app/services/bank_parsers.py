@@ -4,20 +4,46 @@ Parses CSV files from different South African banks into standardized format.
 """
 
 import csv
+import functools
 import io
 import re
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+import sys
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple
 from decimal import Decimal, InvalidOperation
+from .bank_csv_parser import (
+    detect_encoding,
+    normalize_description,
+    row_dict,
+)
 try:
     from dateutil import parser as date_parser
     DATEUTIL_AVAILABLE = True
 except ImportError:
     DATEUTIL_AVAILABLE = False
 
+# Characters dropped from amounts in one pass
+_DECIMAL_STRIP = str.maketrans('', '', 'R ,')
+
+# Dates the explicit formats miss are only retried if they start with a digit
+_DATE_LOOKS_LIKELY = re.compile(r'\d')
+
+# Fallback date shapes, compiled once rather than looked up per call
+_DATE_PATTERNS = (
+    (re.compile(r'^(\d{1,2})[/-](\d{1,2})[/-](\d{4})$'), '%d/%m/%Y'),  # DD/MM/YYYY or DD-MM-YYYY
+    (re.compile(r'^(\d{4})[/-](\d{1,2})[/-](\d{1,2})$'), '%Y/%m/%d'),  # YYYY/MM/DD or YYYY-MM-DD
+    (re.compile(r'^(\d{1,2})[/-](\d{1,2})[/-](\d{2})$'), '%d/%m/%y'),   # DD/MM/YY or DD-MM-YY
+)
+
 
 class BankParseResult:
     """Result of parsing a single CSV row"""
+    # One instance per row; slots keep large files from carrying a __dict__ each
+    __slots__ = (
+        'date', 'description', 'reference', 'amount', 'balance',
+        'external_id', 'raw_data', 'row_number', 'error',
+    )
+    
     def __init__(self):
         self.date: Optional[str] = None
         self.description: Optional[str] = None
@@ -26,16 +52,132 @@ class BankParseResult:
         self.balance: Optional[Decimal] = None
         self.external_id: Optional[str] = None  # Unique transaction ID from bank
         self.raw_data: Optional[Dict] = None
+        self.row_number: Optional[int] = None  # Row number in the file, the header being row 1
         self.error: Optional[str] = None
 
 
 class BankParser:
-    """Base class for bank CSV parsers"""
+    """
+    Base class for bank CSV parsers.
+    
+    Banks differ only in the header names and amount columns they use, so
+    subclasses just declare those lists; all parsing logic lives here.
+    """
+    
+    # Candidate header names per field, in priority order (set by subclasses).
+    # Date, description and amounts are matched case-insensitively, the rest exactly.
+    DATE_FIELDS: List[str] = []
+    DESC_FIELDS: List[str] = []
+    REF_FIELDS: List[str] = []
+    BALANCE_FIELDS: List[str] = []
+    # Common field names across banks
+    EXTERNAL_ID_FIELDS: List[str] = [
+        'Transaction ID', 'TransactionID', 'TransactionId',
+        'Unique Reference', 'UniqueReference', 'Unique Ref',
+        'External ID', 'ExternalID', 'ExternalId',
+        'Reference Number', 'ReferenceNumber', 'Ref Number',
+        'Trace Number', 'TraceNumber', 'Trace No',
+        'Sequence Number', 'SequenceNumber', 'Seq No'
+    ]
+    
+    # Date formats tried in order (order matters - most common first)
+    DATE_FORMATS: Tuple[str, ...] = (
+        '%d/%m/%Y',      # DD/MM/YYYY (most common in SA)
+        '%d-%m-%Y',      # DD-MM-YYYY
+        '%Y-%m-%d',      # YYYY-MM-DD (ISO)
+        '%Y/%m/%d',      # YYYY/MM/DD
+        '%d/%m/%y',      # DD/MM/YY
+        '%d-%m-%y',      # DD-MM-YY
+        '%d %b %Y',      # DD Mon YYYY
+        '%d %B %Y',      # DD Month YYYY
+        '%b %d, %Y',     # Mon DD, YYYY
+        '%B %d, %Y',     # Month DD, YYYY
+        '%d.%m.%Y',      # DD.MM.YYYY
+        '%Y.%m.%d',      # YYYY.MM.DD
+    )
+    # Amount columns, matched by lower-case name in priority order
+    DEBIT_FIELDS: Tuple[str, ...] = ('debit',)
+    CREDIT_FIELDS: Tuple[str, ...] = ('credit',)
+    AMOUNT_FIELDS: Tuple[str, ...] = ('amount', 'transaction amount')
+    AMOUNT_DEBIT_FIELDS: Tuple[str, ...] = ('amount debit',)
+    AMOUNT_CREDIT_FIELDS: Tuple[str, ...] = ('amount credit',)
+    
+    _FIELD_LISTS = {
+        'date': 'DATE_FIELDS',
+        'desc': 'DESC_FIELDS',
+        'ref': 'REF_FIELDS',
+        'balance': 'BALANCE_FIELDS',
+        'external_id': 'EXTERNAL_ID_FIELDS',
+        'debit': 'DEBIT_FIELDS',
+        'credit': 'CREDIT_FIELDS',
+        'amount': 'AMOUNT_FIELDS',
+        'amount_debit': 'AMOUNT_DEBIT_FIELDS',
+        'amount_credit': 'AMOUNT_CREDIT_FIELDS',
+    }
+    _CASE_INSENSITIVE = ('date', 'desc', 'debit', 'credit', 'amount', 'amount_debit', 'amount_credit')
+    
+    # Set by bind_header(); until then every candidate is probed on each row
+    _header_keys: Optional[Dict[str, str]] = None
+    _bound_fields: Optional[Dict[str, List[str]]] = None
+    
+    def bind_header(self, fieldnames: List[str]):
+        """
+        Resolve candidate fields against a file's header once.
+        
+        Rows are then read by probing only the header names that exist,
+        instead of every candidate name on every row.
+        """
+        # Bound names are the header's own string objects, so each row.get()
+        # matches the row's key by identity before comparing characters
+        names = {name: name for name in fieldnames}
+        # Last column wins for duplicate names, like a lower-cased dict of the row
+        self._header_keys = {name.lower(): name for name in fieldnames}
+        self._bound_fields = {}
+        for kind, attr in self._FIELD_LISTS.items():
+            fields = getattr(self, attr)
+            if kind in self._CASE_INSENSITIVE:
+                self._bound_fields[kind] = [
+                    self._header_keys[f.lower()] for f in fields if f.lower() in self._header_keys
+                ]
+            else:
+                self._bound_fields[kind] = [names[f] for f in fields if f in names]
+    
+    def _candidate_fields(self, kind: str) -> List[str]:
+        """Header names to probe for a field: the bound subset, or all candidates"""
+        if self._bound_fields is None:
+            return getattr(self, self._FIELD_LISTS[kind])
+        return self._bound_fields[kind]
+    
+    def _find_field(self, row: Dict[str, str], kind: str) -> Optional[str]:
+        """First non-empty value of a case-insensitively matched field"""
+        if self._bound_fields is None:
+            return self._find_field_case_insensitive(row, self._candidate_fields(kind))
+        for key in self._bound_fields[kind]:
+            value = row.get(key)
+            if value:
+                return value
+        return None
+    
+    def _field_values(self, row: Dict[str, str], kind: str) -> List[str]:
+        """All non-empty values of a case-insensitively matched field, in priority order"""
+        if self._bound_fields is None:
+            keys = _lower_key_map(tuple(row))
+            found = [keys.get(f.lower()) for f in self._candidate_fields(kind)]
+        else:
+            found = self._bound_fields[kind]
+        return [row[key] for key in found if key is not None and row.get(key)]
     
     def parse_row(self, row: Dict[str, str], row_number: int) -> BankParseResult:
         """Parse a single CSV row into standardized format"""
         result = BankParseResult()
         result.raw_data = row
+        result.row_number = row_number
+        
+        # csv.DictReader files extra cells under a None key; usually an
+        # unquoted separator inside a value
+        if None in row:
+            result.error = "Row has more fields than the header"
+            return result
         
         try:
             # Extract and validate required fields
@@ -60,46 +202,81 @@ class BankParser:
         return result
     
     def _parse_date(self, row: Dict[str, str]) -> Optional[str]:
-        """Parse date field - must be implemented by subclasses"""
-        raise NotImplementedError
+        """Parse date field to YYYY-MM-DD"""
+        # Try case-insensitive field matching first
+        date_str = self._find_field(row, 'date')
+        if not date_str:
+            return None
+        
+        date_str = date_str.strip()
+        if not date_str:
+            return None
+        
+        return self._parse_date_string(date_str, self.DATE_FORMATS)
     
     def _normalize_description(self, row: Dict[str, str]) -> Optional[str]:
         """Extract and normalize description"""
         desc = self._get_description(row)
         if desc:
-            # Normalize: trim, collapse spaces, uppercase
-            desc = ' '.join(desc.split()).upper()
+            desc = normalize_description(desc)
         return desc
     
     def _get_description(self, row: Dict[str, str]) -> Optional[str]:
-        """Get description field - must be implemented by subclasses"""
-        raise NotImplementedError
+        """Get description field (case-insensitive)"""
+        return self._find_field(row, 'desc')
     
     def _parse_reference(self, row: Dict[str, str]) -> Optional[str]:
         """Extract reference field - optional"""
+        for field in self._candidate_fields('ref'):
+            if field in row and row[field]:
+                return row[field].strip()
+        
         return None
     
     def _parse_amount(self, row: Dict[str, str]) -> Optional[Decimal]:
-        """Parse amount field - must be implemented by subclasses"""
-        raise NotImplementedError
+        """Signed amount - positive for credits, negative for debits"""
+        # Debit/credit columns carry the sign in the column, not the value.
+        # One negation at most instead of abs() then negation
+        debit = self._decimal_field(row, 'debit')
+        if debit is not None:
+            return debit if debit < 0 else -debit
+        credit = self._decimal_field(row, 'credit')
+        if credit is not None:
+            return credit if credit > 0 else -credit
+        
+        # When there's a single Amount field, preserve the sign as-is
+        # (CSV format already encodes: positive = credit, negative = debit)
+        for amount_str in self._field_values(row, 'amount'):
+            amount = self._parse_decimal(amount_str)
+            if amount is not None:
+                return amount
+        
+        # Try explicit debit/credit amount fields
+        debit = self._decimal_field(row, 'amount_debit')
+        if debit is not None:
+            return debit if debit < 0 else -debit
+        credit = self._decimal_field(row, 'amount_credit')
+        if credit is not None:
+            return credit if credit > 0 else -credit
+        
+        return None
+    
+    def _decimal_field(self, row: Dict[str, str], kind: str) -> Optional[Decimal]:
+        """Decimal of the first non-empty column of a field, None if absent or invalid"""
+        value = self._find_field(row, kind)
+        return self._parse_decimal(value) if value else None
     
     def _parse_balance(self, row: Dict[str, str]) -> Optional[Decimal]:
         """Parse balance field - optional"""
+        for field in self._candidate_fields('balance'):
+            if field in row and row[field]:
+                return self._parse_decimal(row[field])
+        
         return None
     
     def _parse_external_id(self, row: Dict[str, str]) -> Optional[str]:
-        """Extract external/unique transaction ID - optional, implemented by subclasses"""
-        # Common field names across banks
-        external_id_fields = [
-            'Transaction ID', 'TransactionID', 'TransactionId',
-            'Unique Reference', 'UniqueReference', 'Unique Ref',
-            'External ID', 'ExternalID', 'ExternalId',
-            'Reference Number', 'ReferenceNumber', 'Ref Number',
-            'Trace Number', 'TraceNumber', 'Trace No',
-            'Sequence Number', 'SequenceNumber', 'Seq No'
-        ]
-        
-        for field in external_id_fields:
+        """Extract external/unique transaction ID - optional"""
+        for field in self._candidate_fields('external_id'):
             if field in row and row[field]:
                 value = row[field].strip()
                 if value:
@@ -110,425 +287,170 @@ class BankParser:
     @staticmethod
     def _parse_decimal(value: str) -> Optional[Decimal]:
         """Parse decimal value, handling various formats"""
-        if not value or value.strip() == '':
+        # Whitespace-only values need no check of their own: they clean
+        # down to nothing, which Decimal rejects
+        if not value:
             return None
         
-        # Remove currency symbols, spaces, and common separators
-        cleaned = value.replace('R', '').replace('ZAR', '').replace(' ', '').replace(',', '')
-        
-        try:
-            return Decimal(cleaned)
-        except (InvalidOperation, ValueError):
-            return None
+        return _parse_decimal_cached(value)
     
     @staticmethod
     def _find_field_case_insensitive(row: Dict[str, str], field_names: List[str]) -> Optional[str]:
         """Find a field in row using case-insensitive matching"""
-        row_lower = {k.lower(): v for k, v in row.items()}
+        keys = _lower_key_map(tuple(row))
         for field in field_names:
-            field_lower = field.lower()
-            if field_lower in row_lower and row_lower[field_lower]:
-                return row_lower[field_lower]
+            key = keys.get(field.lower())
+            if key is not None and row[key]:
+                return row[key]
         return None
     
     @staticmethod
-    def _parse_date_string(date_str: str, formats: List[str]) -> Optional[str]:
+    def _parse_date_string(date_str: str, formats: Sequence[str]) -> Optional[str]:
         """Try parsing date string with multiple formats"""
         if not date_str or date_str.strip() == '':
             return None
         
-        date_str = date_str.strip()
-        
-        # Try explicit formats first
-        for fmt in formats:
+        return _parse_date_string_cached(date_str.strip(), tuple(formats))
+
+
+@functools.lru_cache(maxsize=64)
+def _lower_key_map(keys: Tuple[str, ...]) -> Dict[str, str]:
+    """Lower-case name -> key for a row's keys, last key winning; rows of a file share one map"""
+    return {key.lower(): key for key in keys if isinstance(key, str)}
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_decimal_cached(value: str) -> Optional[Decimal]:
+    """Parse a non-blank amount, memoized since fees and balances repeat across rows"""
+    # Remove "ZAR" as a unit first; stripping only its R would leave "ZA"
+    # behind and reject the amount
+    if 'ZAR' in value:
+        value = value.replace('ZAR', '')
+    
+    # Remove currency symbols, spaces, and common separators in one pass
+    cleaned = value.translate(_DECIMAL_STRIP)
+    
+    try:
+        return Decimal(cleaned)
+    except (InvalidOperation, ValueError):
+        return None
+
+
+@functools.lru_cache(maxsize=2048)
+def _parse_date_string_cached(date_str: str, formats: Tuple[str, ...]) -> Optional[str]:
+    """Parse a stripped date string, memoized since statements repeat the same dates"""
+    if len(date_str) == 10:
+        # ISO dates go through the C parser instead of strptime
+        if date_str[4] == '-' and date_str[7] == '-':
             try:
-                dt = datetime.strptime(date_str, fmt)
-                return dt.strftime('%Y-%m-%d')
+                return date.fromisoformat(date_str).isoformat()
             except ValueError:
-                continue
-        
-        # If dateutil is available, try flexible parsing as fallback
-        if DATEUTIL_AVAILABLE:
-            try:
-                dt = date_parser.parse(date_str, dayfirst=True)  # dayfirst=True for DD/MM/YYYY preference
-                return dt.strftime('%Y-%m-%d')
-            except (ValueError, TypeError, OverflowError):
                 pass
-        
-        # Try some common variations manually
-        # Handle dates like "29/11/2025" or "29-11-2025"
-        date_patterns = [
-            (r'^(\d{1,2})[/-](\d{1,2})[/-](\d{4})$', '%d/%m/%Y'),  # DD/MM/YYYY or DD-MM-YYYY
-            (r'^(\d{4})[/-](\d{1,2})[/-](\d{1,2})$', '%Y/%m/%d'),  # YYYY/MM/DD or YYYY-MM-DD
-            (r'^(\d{1,2})[/-](\d{1,2})[/-](\d{2})$', '%d/%m/%y'),   # DD/MM/YY or DD-MM-YY
-        ]
-        
-        for pattern, fmt_template in date_patterns:
-            match = re.match(pattern, date_str)
-            if match:
+        # DD/MM/YYYY (and - or . separated), the usual South African layout
+        elif date_str[2] == date_str[5] and date_str[2] in '/-.' and date_str[6] != '0':
+            day, month, year = date_str[:2], date_str[3:5], date_str[6:]
+            if (day + month + year).isdigit() and date_str.isascii():
                 try:
-                    # Normalize separator
-                    normalized = date_str.replace('-', '/')
-                    # Try parsing with the template format
-                    if '/' in normalized:
-                        parts = normalized.split('/')
-                        if len(parts) == 3:
-                            if fmt_template == '%d/%m/%Y':
-                                day, month, year = parts
-                            elif fmt_template == '%Y/%m/%d':
-                                year, month, day = parts
-                            else:  # %d/%m/%y
-                                day, month, year = parts
-                                year = '20' + year if len(year) == 2 else year
-                            
-                            # Validate and parse
-                            dt = datetime(int(year), int(month), int(day))
-                            return dt.strftime('%Y-%m-%d')
-                except (ValueError, TypeError):
-                    continue
-        
+                    return date(int(year), int(month), int(day)).isoformat()
+                except ValueError:
+                    pass
+    
+    # Try explicit formats first
+    for fmt in formats:
+        try:
+            dt = datetime.strptime(date_str, fmt)
+            return dt.strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    
+    # Past the explicit formats, only strings starting with a digit (day or
+    # year first) can still be dates; anything else skips the slow fallbacks
+    if not _DATE_LOOKS_LIKELY.match(date_str):
         return None
+    
+    # If dateutil is available, try flexible parsing as fallback
+    if DATEUTIL_AVAILABLE:
+        try:
+            dt = date_parser.parse(date_str, dayfirst=True)  # dayfirst=True for DD/MM/YYYY preference
+            return dt.strftime('%Y-%m-%d')
+        except (ValueError, TypeError, OverflowError):
+            pass
+    
+    # Try some common variations manually
+    # Handle dates like "29/11/2025" or "29-11-2025"
+    for pattern, fmt_template in _DATE_PATTERNS:
+        match = pattern.match(date_str)
+        if match:
+            try:
+                # Normalize separator
+                normalized = date_str.replace('-', '/')
+                # Try parsing with the template format
+                if '/' in normalized:
+                    parts = normalized.split('/')
+                    if len(parts) == 3:
+                        if fmt_template == '%d/%m/%Y':
+                            day, month, year = parts
+                        elif fmt_template == '%Y/%m/%d':
+                            year, month, day = parts
+                        else:  # %d/%m/%y
+                            day, month, year = parts
+                            year = '20' + year if len(year) == 2 else year
+                        
+                        # Validate and parse
+                        dt = datetime(int(year), int(month), int(day))
+                        return dt.strftime('%Y-%m-%d')
+            except (ValueError, TypeError):
+                continue
+    
+    return None
 
 
 class FNBParser(BankParser):
     """Parser for FNB bank CSV format"""
     
-    def _parse_date(self, row: Dict[str, str]) -> Optional[str]:
-        """FNB typically uses formats like: 2025-03-15 or 15/03/2025"""
-        date_fields = ['Date', 'Transaction Date', 'Value Date', 'Posting Date', 'Effective Date']
-        
-        # Try case-insensitive field matching first
-        date_str = self._find_field_case_insensitive(row, date_fields)
-        if not date_str:
-            return None
-        
-        date_str = date_str.strip()
-        if not date_str:
-            return None
-        
-        # Try common formats (order matters - most common first)
-        formats = [
-            '%d/%m/%Y',      # DD/MM/YYYY (most common in SA)
-            '%d-%m-%Y',      # DD-MM-YYYY
-            '%Y-%m-%d',      # YYYY-MM-DD (ISO)
-            '%Y/%m/%d',      # YYYY/MM/DD
-            '%d/%m/%y',      # DD/MM/YY
-            '%d-%m-%y',      # DD-MM-YY
-            '%d %b %Y',      # DD Mon YYYY
-            '%d %B %Y',      # DD Month YYYY
-            '%b %d, %Y',     # Mon DD, YYYY
-            '%B %d, %Y',     # Month DD, YYYY
-            '%d.%m.%Y',      # DD.MM.YYYY
-            '%Y.%m.%d',      # YYYY.MM.DD
-        ]
-        
-        parsed = self._parse_date_string(date_str, formats)
-        return parsed
-    
-    def _get_description(self, row: Dict[str, str]) -> Optional[str]:
-        """FNB description fields"""
-        desc_fields = ['Description', 'Transaction Description', 'Narrative', 'Details']
-        
-        # Try case-insensitive matching
-        desc = self._find_field_case_insensitive(row, desc_fields)
-        return desc
-    
-    def _parse_reference(self, row: Dict[str, str]) -> Optional[str]:
-        """FNB reference fields"""
-        ref_fields = ['Reference', 'Reference Number', 'Narrative', 'Contra']
-        
-        for field in ref_fields:
-            if field in row and row[field]:
-                return row[field].strip()
-        
-        return None
-    
-    def _parse_amount(self, row: Dict[str, str]) -> Optional[Decimal]:
-        """FNB amount fields - positive for credits, negative for debits"""
-        # Try debit/credit fields first (case-insensitive)
-        row_lower = {k.lower(): v for k, v in row.items()}
-        
-        debit = None
-        credit = None
-        
-        if 'debit' in row_lower and row_lower['debit']:
-            debit = self._parse_decimal(row_lower['debit'])
-        if 'credit' in row_lower and row_lower['credit']:
-            credit = self._parse_decimal(row_lower['credit'])
-        
-        if debit is not None:
-            return -abs(debit)  # Negative for debits
-        if credit is not None:
-            return abs(credit)  # Positive for credits
-        
-        # Try single amount field (case-insensitive)
-        # When there's a single Amount field, preserve the sign as-is
-        # (CSV format already encodes: positive = credit, negative = debit)
-        amount_fields = ['Amount', 'Transaction Amount']
-        for field in amount_fields:
-            amount_str = self._find_field_case_insensitive(row, [field])
-            if amount_str:
-                amount = self._parse_decimal(amount_str)
-                if amount is not None:
-                    # Preserve the sign - CSV already has correct encoding
-                    return amount
-        
-        # Try explicit debit/credit amount fields
-        debit_amount = self._find_field_case_insensitive(row, ['Amount Debit'])
-        credit_amount = self._find_field_case_insensitive(row, ['Amount Credit'])
-        
-        if debit_amount:
-            debit = self._parse_decimal(debit_amount)
-            if debit is not None:
-                return -abs(debit)
-        if credit_amount:
-            credit = self._parse_decimal(credit_amount)
-            if credit is not None:
-                return abs(credit)
-        
-        return None
-    
-    def _parse_balance(self, row: Dict[str, str]) -> Optional[Decimal]:
-        """FNB balance field"""
-        balance_fields = ['Balance', 'Running Balance', 'Available Balance']
-        
-        for field in balance_fields:
-            if field in row and row[field]:
-                return self._parse_decimal(row[field])
-        
-        return None
+    DATE_FIELDS = ['Date', 'Transaction Date', 'Value Date', 'Posting Date', 'Effective Date']
+    DESC_FIELDS = ['Description', 'Transaction Description', 'Narrative', 'Details']
+    REF_FIELDS = ['Reference', 'Reference Number', 'Narrative', 'Contra']
+    BALANCE_FIELDS = ['Balance', 'Running Balance', 'Available Balance']
 
 
 class ABSAParser(BankParser):
     """Parser for ABSA bank CSV format"""
     
-    def _parse_date(self, row: Dict[str, str]) -> Optional[str]:
-        """ABSA date formats"""
-        date_fields = ['Date', 'Transaction Date', 'Posting Date', 'Value Date', 'Effective Date']
-        
-        # Try case-insensitive field matching first
-        date_str = self._find_field_case_insensitive(row, date_fields)
-        if not date_str:
-            return None
-        
-        date_str = date_str.strip()
-        if not date_str:
-            return None
-        
-        formats = [
-            '%d/%m/%Y',      # DD/MM/YYYY (most common in SA)
-            '%d-%m-%Y',      # DD-MM-YYYY
-            '%Y-%m-%d',      # YYYY-MM-DD (ISO)
-            '%Y/%m/%d',      # YYYY/MM/DD
-            '%d/%m/%y',      # DD/MM/YY
-            '%d-%m-%y',      # DD-MM-YY
-            '%d %b %Y',      # DD Mon YYYY
-            '%d %B %Y',      # DD Month YYYY
-            '%b %d, %Y',     # Mon DD, YYYY
-            '%B %d, %Y',     # Month DD, YYYY
-            '%d.%m.%Y',      # DD.MM.YYYY
-            '%Y.%m.%d',      # YYYY.MM.DD
-        ]
-        
-        parsed = self._parse_date_string(date_str, formats)
-        return parsed
-    
-    def _get_description(self, row: Dict[str, str]) -> Optional[str]:
-        """ABSA description fields"""
-        desc_fields = ['Description', 'Transaction Description', 'Narrative', 'Details', 'Memo']
-        
-        # Try case-insensitive matching
-        desc = self._find_field_case_insensitive(row, desc_fields)
-        return desc
-    
-    def _parse_reference(self, row: Dict[str, str]) -> Optional[str]:
-        """ABSA reference fields"""
-        ref_fields = ['Reference', 'Reference Number', 'Narrative', 'Contra', 'Cheque Number']
-        
-        for field in ref_fields:
-            if field in row and row[field]:
-                return row[field].strip()
-        
-        return None
-    
-    def _parse_amount(self, row: Dict[str, str]) -> Optional[Decimal]:
-        """ABSA amount fields"""
-        # Try debit/credit fields first (case-insensitive)
-        row_lower = {k.lower(): v for k, v in row.items()}
-        
-        debit = None
-        credit = None
-        
-        if 'debit' in row_lower and row_lower['debit']:
-            debit = self._parse_decimal(row_lower['debit'])
-        if 'credit' in row_lower and row_lower['credit']:
-            credit = self._parse_decimal(row_lower['credit'])
-        if 'withdrawal' in row_lower and row_lower['withdrawal']:
-            debit = self._parse_decimal(row_lower['withdrawal'])
-        if 'deposit' in row_lower and row_lower['deposit']:
-            credit = self._parse_decimal(row_lower['deposit'])
-        
-        if debit is not None:
-            return -abs(debit)
-        if credit is not None:
-            return abs(credit)
-        
-        # Try single amount field (case-insensitive)
-        # When there's a single Amount field, preserve the sign as-is
-        # (CSV format already encodes: positive = credit, negative = debit)
-        amount_fields = ['Amount', 'Transaction Amount']
-        for field in amount_fields:
-            amount_str = self._find_field_case_insensitive(row, [field])
-            if amount_str:
-                amount = self._parse_decimal(amount_str)
-                if amount is not None:
-                    # Preserve the sign - CSV already has correct encoding
-                    return amount
-        
-        # Try explicit debit/credit amount fields
-        debit_amount = self._find_field_case_insensitive(row, ['Amount Debit'])
-        credit_amount = self._find_field_case_insensitive(row, ['Amount Credit'])
-        
-        if debit_amount:
-            debit = self._parse_decimal(debit_amount)
-            if debit is not None:
-                return -abs(debit)
-        if credit_amount:
-            credit = self._parse_decimal(credit_amount)
-            if credit is not None:
-                return abs(credit)
-        
-        return None
-    
-    def _parse_balance(self, row: Dict[str, str]) -> Optional[Decimal]:
-        """ABSA balance field"""
-        balance_fields = ['Balance', 'Running Balance', 'Available Balance']
-        
-        for field in balance_fields:
-            if field in row and row[field]:
-                return self._parse_decimal(row[field])
-        
-        return None
+    DATE_FIELDS = ['Date', 'Transaction Date', 'Posting Date', 'Value Date', 'Effective Date']
+    DESC_FIELDS = ['Description', 'Transaction Description', 'Narrative', 'Details', 'Memo']
+    REF_FIELDS = ['Reference', 'Reference Number', 'Narrative', 'Contra', 'Cheque Number']
+    BALANCE_FIELDS = ['Balance', 'Running Balance', 'Available Balance']
+    DEBIT_FIELDS = ('withdrawal', 'debit')
+    CREDIT_FIELDS = ('deposit', 'credit')
 
 
 class StandardBankParser(BankParser):
     """Parser for Standard Bank CSV format"""
     
-    def _parse_date(self, row: Dict[str, str]) -> Optional[str]:
-        """Standard Bank date formats"""
-        date_fields = ['Date', 'Transaction Date', 'Posting Date', 'Value Date', 'Effective Date']
-        
-        # Try case-insensitive field matching first
-        date_str = self._find_field_case_insensitive(row, date_fields)
-        if not date_str:
-            return None
-        
-        date_str = date_str.strip()
-        if not date_str:
-            return None
-        
-        formats = [
-            '%d/%m/%Y',      # DD/MM/YYYY (most common in SA)
-            '%d-%m-%Y',      # DD-MM-YYYY
-            '%Y-%m-%d',      # YYYY-MM-DD (ISO)
-            '%Y/%m/%d',      # YYYY/MM/DD
-            '%d/%m/%y',      # DD/MM/YY
-            '%d-%m-%y',      # DD-MM-YY
-            '%d %b %Y',      # DD Mon YYYY
-            '%d %B %Y',      # DD Month YYYY
-            '%b %d, %Y',     # Mon DD, YYYY
-            '%B %d, %Y',     # Month DD, YYYY
-            '%d.%m.%Y',      # DD.MM.YYYY
-            '%Y.%m.%d',      # YYYY.MM.DD
-        ]
-        
-        parsed = self._parse_date_string(date_str, formats)
-        return parsed
-    
-    def _get_description(self, row: Dict[str, str]) -> Optional[str]:
-        """Standard Bank description fields"""
-        desc_fields = ['Description', 'Transaction Description', 'Narrative', 'Details']
-        
-        # Try case-insensitive matching
-        desc = self._find_field_case_insensitive(row, desc_fields)
-        return desc
-    
-    def _parse_reference(self, row: Dict[str, str]) -> Optional[str]:
-        """Standard Bank reference fields"""
-        ref_fields = ['Reference', 'Reference Number', 'Narrative']
-        
-        for field in ref_fields:
-            if field in row and row[field]:
-                return row[field].strip()
-        
-        return None
-    
-    def _parse_amount(self, row: Dict[str, str]) -> Optional[Decimal]:
-        """Standard Bank amount fields"""
-        # Try debit/credit fields first (case-insensitive)
-        row_lower = {k.lower(): v for k, v in row.items()}
-        
-        debit = None
-        credit = None
-        
-        if 'debit' in row_lower and row_lower['debit']:
-            debit = self._parse_decimal(row_lower['debit'])
-        if 'credit' in row_lower and row_lower['credit']:
-            credit = self._parse_decimal(row_lower['credit'])
-        
-        if debit is not None:
-            return -abs(debit)
-        if credit is not None:
-            return abs(credit)
-        
-        # Try single amount field (case-insensitive)
-        # When there's a single Amount field, preserve the sign as-is
-        # (CSV format already encodes: positive = credit, negative = debit)
-        amount_fields = ['Amount', 'Transaction Amount']
-        for field in amount_fields:
-            amount_str = self._find_field_case_insensitive(row, [field])
-            if amount_str:
-                amount = self._parse_decimal(amount_str)
-                if amount is not None:
-                    # Preserve the sign - CSV already has correct encoding
-                    return amount
-        
-        # Try explicit debit/credit amount fields
-        debit_amount = self._find_field_case_insensitive(row, ['Amount Debit'])
-        credit_amount = self._find_field_case_insensitive(row, ['Amount Credit'])
-        
-        if debit_amount:
-            debit = self._parse_decimal(debit_amount)
-            if debit is not None:
-                return -abs(debit)
-        if credit_amount:
-            credit = self._parse_decimal(credit_amount)
-            if credit is not None:
-                return abs(credit)
-        
-        return None
-    
-    def _parse_balance(self, row: Dict[str, str]) -> Optional[Decimal]:
-        """Standard Bank balance field"""
-        balance_fields = ['Balance', 'Running Balance']
-        
-        for field in balance_fields:
-            if field in row and row[field]:
-                return self._parse_decimal(row[field])
-        
-        return None
+    DATE_FIELDS = ['Date', 'Transaction Date', 'Posting Date', 'Value Date', 'Effective Date']
+    DESC_FIELDS = ['Description', 'Transaction Description', 'Narrative', 'Details']
+    REF_FIELDS = ['Reference', 'Reference Number', 'Narrative']
+    BALANCE_FIELDS = ['Balance', 'Running Balance']
 
 
 def get_parser(bank_name: str) -> BankParser:
     """Get the appropriate parser for a bank name"""
+    # A fresh instance per call: bind_header() stores per-file state on it
+    return _parser_class(bank_name)()
+
+
+@functools.lru_cache(maxsize=16)
+def _parser_class(bank_name: str) -> type:
+    """Parser class for a bank name, resolved once per distinct name"""
     bank_name_upper = bank_name.upper().strip()
     
     if 'FNB' in bank_name_upper or 'FIRST NATIONAL BANK' in bank_name_upper:
-        return FNBParser()
+        return FNBParser
     elif 'ABSA' in bank_name_upper:
-        return ABSAParser()
+        return ABSAParser
     elif 'STANDARD' in bank_name_upper or 'STD BANK' in bank_name_upper:
-        return StandardBankParser()
+        return StandardBankParser
     else:
         raise ValueError(f"Bank format not supported: {bank_name}")
 
@@ -552,34 +474,53 @@ def parse_csv_file(
     # Get parser
     parser = get_parser(bank_name)
     
-    # Decode file
-    try:
-        content = file_content.decode('utf-8')
-    except UnicodeDecodeError:
-        try:
-            content = file_content.decode('latin-1')
-        except UnicodeDecodeError:
-            raise ValueError("Unable to decode file. Expected UTF-8 or Latin-1 encoding.")
+    # Decode lazily as rows are read instead of holding a full str copy
+    encoding = detect_encoding(file_content)
+    text = io.TextIOWrapper(io.BytesIO(file_content), encoding=encoding, newline='')
     
     # Auto-detect delimiter if not provided
     if delimiter is None:
         sniffer = csv.Sniffer()
-        sample = content[:1024]
+        # A multi-byte character cut at the boundary is irrelevant to sniffing
+        sample = file_content[:1024].decode(encoding, errors='ignore')
         try:
             delimiter = sniffer.sniff(sample).delimiter
         except:
             delimiter = ','  # Default to comma
     
-    # Parse CSV
-    reader = csv.DictReader(io.StringIO(content), delimiter=delimiter)
+    # Parse CSV positionally; rows are zipped against the header directly
+    # instead of going through csv.DictReader's per-row Python wrapper
+    reader = csv.reader(text, delimiter=delimiter)
+    fieldnames = next(reader, None) or []
+    # Every row dict shares these key objects; interned, they also match literals
+    fieldnames = [sys.intern(f) for f in fieldnames]
+    parser.bind_header(fieldnames)
     
+    return _parse_records(parser, fieldnames, _records(reader))
+
+
+def _records(reader):
+    """Yield (row_number, values) for each data row"""
+    row_number = 1  # Row 1 is the header
+    for values in reader:
+        # Blank lines are skipped without being counted, as csv.DictReader does
+        if not values:
+            continue
+        row_number += 1
+        yield row_number, values
+
+
+def _parse_records(
+    parser: BankParser,
+    fieldnames: List[str],
+    records
+) -> Tuple[List[BankParseResult], List[BankParseResult]]:
+    """Parse (row_number, values) records into valid and error results"""
     valid_results = []
     error_results = []
     
-    for row_number, row in enumerate(reader, start=2):  # Start at 2 (row 1 is header)
-        # Store row number in raw_data for reference
-        row['_row_number'] = row_number
-        result = parser.parse_row(row, row_number)
+    for row_number, values in records:
+        result = parser.parse_row(row_dict(fieldnames, values), row_number)
         
         if result.error:
             error_results.append(result)
@@ -587,4 +528,3 @@ def parse_csv_file(
             valid_results.append(result)
     
     return valid_results, error_results
-
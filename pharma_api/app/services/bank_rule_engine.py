@@ -4,13 +4,139 @@ Evaluates bank rules against bank transactions and creates ledger entries.
 """
 
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Set, Tuple, Callable
 from datetime import date, datetime
 from decimal import Decimal
 import re
+from functools import lru_cache
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Conditions the substring automata can answer
+_SUBSTRING_OPERATORS = ('contains', 'not_contains')
+_TEXT_FIELDS = ('description', 'reference')
+
+# Fields and string operators a rule condition can use
+_CONDITION_FIELDS = frozenset(('description', 'reference', 'amount', 'amount_in', 'amount_out', 'date'))
+_TEXT_OPERATORS = frozenset(('contains', 'not_contains', 'equals', 'starts_with', 'ends_with'))
+# Fields that are always numeric, so comparisons on them can be evaluated for the whole batch
+_AMOUNT_FIELDS = frozenset(('amount', 'amount_in', 'amount_out'))
+
+# Transactions fetched and classified per round trip in apply_rules_to_batch
+_BATCH_PAGE_SIZE = 1000
+
+# Per-process match counts by rule id, used to try frequent rules first within a priority
+_rule_match_counts: Dict[int, int] = {}
+
+
+@lru_cache(maxsize=1024)
+def _compiled_regex(pattern: str) -> Optional[re.Pattern]:
+    """Compile a rule regex once; invalid patterns are cached as None."""
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error:
+        return None
+
+
+def _field_value(field: str, transaction: Dict[str, Any]) -> Any:
+    """Value of a rule condition field for a transaction."""
+    if field == 'description':
+        return transaction.get('description', '') or ''
+    elif field == 'reference':
+        return transaction.get('reference', '') or ''
+    elif field == 'amount':
+        return float(transaction.get('amount', 0))
+    elif field == 'amount_in':
+        # amount_in is positive amount
+        amount = float(transaction.get('amount', 0))
+        return amount if amount > 0 else 0
+    elif field == 'amount_out':
+        # amount_out is absolute value of negative amount
+        amount = float(transaction.get('amount', 0))
+        return abs(amount) if amount < 0 else 0
+    else:
+        return transaction.get('date')
+
+
+def _never_matches(columns: '_TransactionColumns', i: int, hits: Optional[Set[Tuple[str, str]]]) -> bool:
+    """Check for conditions that can never match (unknown field or operator, bad pattern)."""
+    return False
+
+
+class _TransactionColumns(dict):
+    """
+    Column-wise view of a list of transactions for rule matching.
+    
+    Keyed by (field, lowered): each column holds that field's value for every
+    transaction (lowercased string when lowered is True). Columns are built on
+    first use, so a field is extracted and lowercased once per batch rather
+    than once per condition check.
+    
+    Amount comparisons are likewise evaluated for every transaction at once
+    (with numpy when available) and cached per (field, operator, value).
+    """
+    
+    def __init__(self, transactions: List[Dict[str, Any]]):
+        super().__init__()
+        self.transactions = transactions
+        self.masks: Dict[Tuple[str, str, Any], List[bool]] = {}
+        self.arrays: Dict[str, Any] = {}
+    
+    def amount_array(self, field: str) -> 'np.ndarray':
+        """Amount field as a float64 array; amount_in/amount_out derived from amount without branching."""
+        array = self.arrays.get(field)
+        if array is None:
+            if field == 'amount':
+                array = np.asarray(self['amount', False], dtype=np.float64)
+            elif field == 'amount_in':
+                array = np.maximum(self.amount_array('amount'), 0.0)
+            else:
+                array = np.maximum(-self.amount_array('amount'), 0.0)
+            self.arrays[field] = array
+        return array
+    
+    def compare(self, field: str, operator: str, value: Any) -> List[bool]:
+        """greater_than/less_than result of an amount field against value, per transaction."""
+        key = (field, operator, value)
+        mask = self.masks.get(key)
+        if mask is not None:
+            return mask
+        
+        try:
+            threshold = float(value)
+        except (ValueError, TypeError):
+            mask = [False] * len(self.transactions)
+        else:
+            if NUMPY_AVAILABLE:
+                amounts = self.amount_array(field)
+                mask = (amounts > threshold if operator == 'greater_than' else amounts < threshold).tolist()
+            elif operator == 'greater_than':
+                mask = [amount > threshold for amount in self[field, False]]
+            else:
+                mask = [amount < threshold for amount in self[field, False]]
+        self.masks[key] = mask
+        return mask
+    
+    def __missing__(self, key: Tuple[str, bool]) -> List[Any]:
+        field, lowered = key
+        if lowered:
+            column = [str(value).lower() for value in self[field, False]]
+        else:
+            column = [_field_value(field, txn) for txn in self.transactions]
+        self[key] = column
+        return column
+
 
 class BankRuleEngine:
     """Engine for evaluating bank rules and auto-classifying transactions"""
@@ -28,35 +154,68 @@ class BankRuleEngine:
                 'unclassified': int
             }
         """
-        with conn.cursor() as cur:
-            # Get all transactions in batch
-            cur.execute("""
-                SELECT id, pharmacy_id, date, description, reference, amount, classification_status
+        # The batch's transactions are read through a server-side cursor one page at a
+        # time, so only a page of rows (and its column view) is held in memory
+        with conn.cursor() as cur, conn.cursor(name=f'bank_rule_batch_{batch_id}') as scan:
+            scan.itersize = _BATCH_PAGE_SIZE
+            scan.execute("""
+                SELECT id, pharmacy_id, bank_account_id, date, description, reference, amount,
+                       classification_status
                 FROM pharma.bank_transactions
                 WHERE bank_import_batch_id = %s
             """, (batch_id,))
             
-            transactions = cur.fetchall()
-            total_lines = len(transactions)
+            total_lines = 0
             classified_by_rule = 0
             already_classified = 0
             unclassified = 0
             
-            for txn in transactions:
-                # Check classification status (default to 'unclassified' if not set)
-                status = txn.get('classification_status', 'unclassified')
-                if status != 'unclassified':
-                    already_classified += 1
-                    continue
+            rules_by_pharmacy: Dict[int, List[Dict[str, Any]]] = {}
+            automata: Dict[int, Optional[Dict[str, Any]]] = {}
+            # Bank ledger account per bank_account_id, resolved on first use
+            bank_ledger_accounts: Dict[Optional[int], int] = {}
+            
+            while True:
+                transactions = scan.fetchmany(_BATCH_PAGE_SIZE)
+                if not transactions:
+                    break
+                total_lines += len(transactions)
                 
-                result = BankRuleEngine.apply_rules_to_transaction(
-                    conn, txn['id'], txn['pharmacy_id']
-                )
+                # Rules and their conditions for any pharmacy not seen yet, in one query
+                new_pharmacy_ids = list({txn['pharmacy_id'] for txn in transactions} - rules_by_pharmacy.keys())
+                if new_pharmacy_ids:
+                    loaded = BankRuleEngine._load_rules(cur, new_pharmacy_ids)
+                    for pharmacy_id in new_pharmacy_ids:
+                        rules_by_pharmacy[pharmacy_id] = loaded.get(pharmacy_id, [])
+                        automata[pharmacy_id] = BankRuleEngine._build_substring_automata(
+                            rules_by_pharmacy[pharmacy_id]
+                        )
                 
-                if result:
-                    classified_by_rule += 1
-                else:
-                    unclassified += 1
+                columns = _TransactionColumns(transactions)
+                matches = []
+                for i, txn in enumerate(transactions):
+                    # Check classification status (default to 'unclassified' if not set)
+                    status = txn.get('classification_status', 'unclassified')
+                    if status != 'unclassified':
+                        already_classified += 1
+                        continue
+                    
+                    rule = BankRuleEngine._first_matching_rule(
+                        columns, i, rules_by_pharmacy[txn['pharmacy_id']],
+                        automata[txn['pharmacy_id']]
+                    )
+                    
+                    if rule:
+                        matches.append((txn, rule))
+                    else:
+                        unclassified += 1
+                
+                # Write the page's classifications together
+                BankRuleEngine._classify_matches(cur, matches, bank_ledger_accounts)
+                classified_by_rule += len(matches)
+            
+            # Commit once, after the scan
+            conn.commit()
             
             return {
                 'total_lines': total_lines,
@@ -76,7 +235,8 @@ class BankRuleEngine:
         with conn.cursor() as cur:
             # Get transaction
             cur.execute("""
-                SELECT id, pharmacy_id, date, description, reference, amount, classification_status
+                SELECT id, pharmacy_id, bank_account_id, date, description, reference, amount,
+                       classification_status
                 FROM pharma.bank_transactions
                 WHERE id = %s
             """, (transaction_id,))
@@ -90,271 +250,410 @@ class BankRuleEngine:
             if status != 'unclassified':
                 return None
             
-            # Get active rules for this pharmacy, ordered by priority
-            cur.execute("""
-                SELECT id, name, type, priority, allocate_json, contact_name
-                FROM pharma.bank_rules
-                WHERE pharmacy_id = %s AND is_active = true
-                ORDER BY priority ASC
-            """, (pharmacy_id,))
-            
-            rules = cur.fetchall()
+            rules = BankRuleEngine._load_rules(cur, [pharmacy_id]).get(pharmacy_id, [])
+            rule = BankRuleEngine._first_matching_rule(_TransactionColumns([txn]), 0, rules)
+            if not rule:
+                return None
             
-            # Try each rule
-            for rule in rules:
-                if BankRuleEngine._rule_matches(conn, rule['id'], txn):
-                    # Rule matched - create ledger entry
-                    ledger_entry_id = BankRuleEngine._create_ledger_entry_from_rule(
-                        conn, txn, rule
-                    )
-                    
-                    # Update transaction classification
-                    cur.execute("""
-                        UPDATE pharma.bank_transactions
-                        SET classification_status = 'rule_classified',
-                            classified_at = NOW(),
-                            classified_by_rule_id = %s,
-                            ledger_entry_id = %s
-                        WHERE id = %s
-                    """, (rule['id'], ledger_entry_id, transaction_id))
-                    
-                    conn.commit()
-                    logger.info(f"Rule {rule['id']} matched transaction {transaction_id}")
-                    return rule['id']
+            BankRuleEngine._classify_matches(cur, [(txn, rule)])
+            conn.commit()
+            return rule['id']
+    
+    @staticmethod
+    def _load_rules(cur, pharmacy_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Load active rules with their conditions for the given pharmacies.
+        
+        Returns:
+            {pharmacy_id: [rule, ...]} with rules in priority order, each
+            carrying its conditions under 'conditions'
+        """
+        rules_by_pharmacy: Dict[int, List[Dict[str, Any]]] = {}
+        if not pharmacy_ids:
+            return rules_by_pharmacy
+        
+        cur.execute("""
+            SELECT r.pharmacy_id, r.id, r.name, r.type, r.priority, r.allocate_json, r.contact_name,
+                   c.group_type, c.field, c.operator, c.value
+            FROM pharma.bank_rules r
+            LEFT JOIN pharma.bank_rule_conditions c ON c.bank_rule_id = r.id
+            WHERE r.pharmacy_id = ANY(%s) AND r.is_active = true
+            ORDER BY r.priority ASC, r.id, c.id
+        """, (pharmacy_ids,))
+        
+        rules_by_id: Dict[int, Dict[str, Any]] = {}
+        for row in cur.fetchall():
+            rule = rules_by_id.get(row['id'])
+            if rule is None:
+                rule = {
+                    'id': row['id'],
+                    'name': row['name'],
+                    'type': row['type'],
+                    'priority': row['priority'],
+                    'allocate_json': row['allocate_json'],
+                    # Parsed allocate_json, filled on the rule's first match
+                    'allocate': None,
+                    'contact_name': row['contact_name'],
+                    'conditions': [],
+                }
+                rules_by_id[row['id']] = rule
+                rules_by_pharmacy.setdefault(row['pharmacy_id'], []).append(rule)
             
+            # Rules without conditions come back once with NULL condition columns
+            if row['operator'] is not None:
+                condition = {
+                    'group_type': row['group_type'],
+                    'field': row['field'],
+                    'operator': row['operator'],
+                    'value': row['value'],
+                    # Lowercased once here instead of on every string comparison
+                    'value_lc': str(row['value']).lower(),
+                }
+                condition['match'] = BankRuleEngine._condition_matcher(condition)
+                rule['conditions'].append(condition)
+        
+        # Group each rule's checks once rather than on every transaction
+        for rule in rules_by_id.values():
+            rule['all_matchers'] = [c['match'] for c in rule['conditions'] if c['group_type'] == 'ALL']
+            rule['any_matchers'] = [c['match'] for c in rule['conditions'] if c['group_type'] == 'ANY']
+        
+        # Equal-priority rules are unordered, so try the ones that fire most often first
+        for rules in rules_by_pharmacy.values():
+            rules.sort(key=lambda r: (r['priority'], -_rule_match_counts.get(r['id'], 0)))
+        
+        return rules_by_pharmacy
+    
+    @staticmethod
+    def _build_substring_automata(rules: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Build one Aho-Corasick automaton per text field over the lowercased
+        values of all contains/not_contains conditions in a rule set.
+        
+        Returns:
+            {field: automaton}, or None if pyahocorasick is not installed
+        """
+        if not AHOCORASICK_AVAILABLE:
             return None
+        
+        automata: Dict[str, Any] = {}
+        for rule in rules:
+            for condition in rule['conditions']:
+                if (condition['operator'] in _SUBSTRING_OPERATORS
+                        and condition['field'] in _TEXT_FIELDS):
+                    value_lc = condition['value_lc']
+                    if not value_lc:
+                        continue
+                    automaton = automata.get(condition['field'])
+                    if automaton is None:
+                        automaton = automata[condition['field']] = ahocorasick.Automaton()
+                    automaton.add_word(value_lc, value_lc)
+        
+        for automaton in automata.values():
+            automaton.make_automaton()
+        return automata
+    
+    @staticmethod
+    def _substring_hits(automata: Dict[str, Any], columns: '_TransactionColumns', i: int) -> Set[Tuple[str, str]]:
+        """Scan each text field of transaction i once and return the (field, value) pairs found in it."""
+        hits: Set[Tuple[str, str]] = set()
+        for field in _TEXT_FIELDS:
+            automaton = automata.get(field)
+            if automaton is None:
+                continue
+            for _end, value_lc in automaton.iter(columns[field, True][i]):
+                hits.add((field, value_lc))
+        return hits
     
     @staticmethod
-    def _rule_matches(conn, rule_id: int, transaction: Dict[str, Any]) -> bool:
+    def _first_matching_rule(columns: '_TransactionColumns', i: int, rules: List[Dict[str, Any]],
+                             automata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         """
-        Check if a rule matches a transaction by evaluating all conditions.
+        Find the first rule (in the given order) whose conditions match transaction i of columns.
         
         Returns:
-            True if rule matches, False otherwise
+            the matching rule, or None
         """
-        with conn.cursor() as cur:
-            # Get all conditions for this rule
-            cur.execute("""
-                SELECT group_type, field, operator, value
-                FROM pharma.bank_rule_conditions
-                WHERE bank_rule_id = %s
-                ORDER BY id
-            """, (rule_id,))
-            
-            conditions = cur.fetchall()
-            
-            if not conditions:
-                return False  # Rule with no conditions doesn't match
-            
-            # Group conditions by group_type
-            all_conditions = [c for c in conditions if c['group_type'] == 'ALL']
-            any_conditions = [c for c in conditions if c['group_type'] == 'ANY']
-            
-            # ALL conditions must all match
-            if all_conditions:
-                for condition in all_conditions:
-                    if not BankRuleEngine._condition_matches(condition, transaction):
-                        return False
-            
-            # ANY conditions - at least one must match
-            if any_conditions:
-                any_matched = False
-                for condition in any_conditions:
-                    if BankRuleEngine._condition_matches(condition, transaction):
-                        any_matched = True
-                        break
-                if not any_matched:
-                    return False
-            
-            return True
+        # With automata, every substring condition is resolved by a single scan per field
+        hits = BankRuleEngine._substring_hits(automata, columns, i) if automata is not None else None
+        
+        for rule in rules:
+            if BankRuleEngine._rule_matches(rule, columns, i, hits):
+                return rule
+        return None
     
     @staticmethod
-    def _condition_matches(condition: Dict[str, Any], transaction: Dict[str, Any]) -> bool:
+    def _classify_matches(cur, matches: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+                          bank_ledger_accounts: Optional[Dict[Optional[int], int]] = None) -> None:
         """
-        Check if a single condition matches a transaction.
+        Create ledger entries for matched (transaction, rule) pairs and mark the
+        transactions as rule-classified, one statement each for the whole list.
+        The caller commits.
+        """
+        if not matches:
+            return
+        
+        entries = [
+            BankRuleEngine._build_ledger_entry(cur, txn, rule, bank_ledger_accounts)
+            for txn, rule in matches
+        ]
+        
+        # Insert ledger entries
+        # Use 'BANK' source for now (will be 'BANK_RULE' after enum update)
+        cur.execute("""
+            INSERT INTO pharma.ledger_entries
+            (pharmacy_id, date, description, amount, debit_account_id, credit_account_id,
+             source, source_reference_type, source_reference_id, bank_transaction_id)
+            SELECT e.pharmacy_id, e.date, e.description, e.amount, e.debit_account_id, e.credit_account_id,
+                   'BANK'::pharma.ledger_source, 'bank_transaction', e.bank_transaction_id::text,
+                   e.bank_transaction_id
+            FROM unnest(%s::integer[], %s::date[], %s::text[], %s::numeric[],
+                        %s::bigint[], %s::bigint[], %s::bigint[])
+                 AS e(pharmacy_id, date, description, amount, debit_account_id, credit_account_id,
+                      bank_transaction_id)
+            RETURNING id, bank_transaction_id
+        """, [list(column) for column in zip(*entries)])
+        ledger_entry_ids = {row['bank_transaction_id']: row['id'] for row in cur.fetchall()}
+        
+        # Update transaction classification
+        transaction_ids = [txn['id'] for txn, _rule in matches]
+        cur.execute("""
+            UPDATE pharma.bank_transactions t
+            SET classification_status = 'rule_classified',
+                classified_at = NOW(),
+                classified_by_rule_id = m.rule_id,
+                ledger_entry_id = m.ledger_entry_id
+            FROM unnest(%s::bigint[], %s::bigint[], %s::bigint[])
+                 AS m(transaction_id, rule_id, ledger_entry_id)
+            WHERE t.id = m.transaction_id
+        """, (
+            transaction_ids,
+            [rule['id'] for _txn, rule in matches],
+            [ledger_entry_ids[transaction_id] for transaction_id in transaction_ids]
+        ))
+        
+        for txn, rule in matches:
+            _rule_match_counts[rule['id']] = _rule_match_counts.get(rule['id'], 0) + 1
+            logger.info(f"Rule {rule['id']} matched transaction {txn['id']}")
+    
+    @staticmethod
+    def _rule_matches(rule: Dict[str, Any], columns: '_TransactionColumns', i: int,
+                      hits: Optional[Set[Tuple[str, str]]] = None) -> bool:
+        """
+        Check if a rule matches transaction i of columns by evaluating all its conditions.
         
         Returns:
-            True if condition matches, False otherwise
+            True if rule matches, False otherwise
+        """
+        if not rule['conditions']:
+            return False  # Rule with no conditions doesn't match
+        
+        # ALL conditions must all match
+        for match in rule['all_matchers']:
+            if not match(columns, i, hits):
+                return False
+        
+        # ANY conditions - at least one must match
+        any_matchers = rule['any_matchers']
+        if any_matchers:
+            for match in any_matchers:
+                if match(columns, i, hits):
+                    break
+            else:
+                return False
+        
+        return True
+    
+    @staticmethod
+    def _condition_matcher(condition: Dict[str, Any]) -> Callable[['_TransactionColumns', int, Optional[Set[Tuple[str, str]]]], bool]:
+        """
+        Build the check for a single condition once, when rules are loaded.
+        
+        The returned function takes (columns, i, hits) and tells whether the
+        condition matches transaction i of columns. hits, when given, holds the
+        (field, value) pairs found by the substring automata and answers
+        contains/not_contains directly.
         """
         field = condition['field']
         operator = condition['operator']
         value = condition['value']
+        value_lc = condition['value_lc']
         
-        # Get field value from transaction
-        if field == 'description':
-            field_value = transaction.get('description', '') or ''
-        elif field == 'reference':
-            field_value = transaction.get('reference', '') or ''
-        elif field == 'amount':
-            field_value = float(transaction.get('amount', 0))
-        elif field == 'amount_in':
-            # amount_in is positive amount
-            amount = float(transaction.get('amount', 0))
-            field_value = amount if amount > 0 else 0
-        elif field == 'amount_out':
-            # amount_out is absolute value of negative amount
-            amount = float(transaction.get('amount', 0))
-            field_value = abs(amount) if amount < 0 else 0
-        elif field == 'date':
-            field_value = transaction.get('date')
-        else:
-            return False
-        
-        # Apply operator
-        if operator == 'contains':
-            return str(value).lower() in str(field_value).lower()
-        elif operator == 'not_contains':
-            return str(value).lower() not in str(field_value).lower()
-        elif operator == 'equals':
-            return str(field_value).lower() == str(value).lower()
-        elif operator == 'starts_with':
-            return str(field_value).lower().startswith(str(value).lower())
-        elif operator == 'ends_with':
-            return str(field_value).lower().endswith(str(value).lower())
-        elif operator == 'greater_than':
-            try:
-                return float(field_value) > float(value)
-            except (ValueError, TypeError):
-                return False
-        elif operator == 'less_than':
+        if field not in _CONDITION_FIELDS:
+            return _never_matches
+        
+        if operator in _TEXT_OPERATORS:
+            key = (field, True)
+            if operator in _SUBSTRING_OPERATORS:
+                found = (field, value_lc)
+                expected = operator == 'contains'
+                indexed = field in _TEXT_FIELDS and bool(value_lc)
+                
+                def match(columns, i, hits):
+                    if hits is not None and indexed:
+                        return (found in hits) == expected
+                    return (value_lc in columns[key][i]) == expected
+            elif operator == 'equals':
+                def match(columns, i, hits):
+                    return columns[key][i] == value_lc
+            elif operator == 'starts_with':
+                def match(columns, i, hits):
+                    return columns[key][i].startswith(value_lc)
+            else:
+                def match(columns, i, hits):
+                    return columns[key][i].endswith(value_lc)
+            return match
+        
+        if operator in ('greater_than', 'less_than'):
+            if field in _AMOUNT_FIELDS:
+                def match(columns, i, hits):
+                    return columns.compare(field, operator, value)[i]
+                return match
+            
             try:
-                return float(field_value) < float(value)
+                threshold = float(value)
             except (ValueError, TypeError):
-                return False
-        elif operator == 'regex':
-            try:
-                return bool(re.search(value, str(field_value), re.IGNORECASE))
-            except re.error:
-                return False
+                return _never_matches
+            greater = operator == 'greater_than'
+            key = (field, False)
+            
+            def match(columns, i, hits):
+                try:
+                    number = float(columns[key][i])
+                except (ValueError, TypeError):
+                    return False
+                return number > threshold if greater else number < threshold
+            return match
         
-        return False
+        if operator == 'regex':
+            pattern = _compiled_regex(str(value))
+            if pattern is None:
+                return _never_matches
+            key = (field, False)
+            
+            def match(columns, i, hits):
+                return pattern.search(str(columns[key][i])) is not None
+            return match
+        
+        return _never_matches
     
     @staticmethod
-    def _create_ledger_entry_from_rule(conn, transaction: Dict[str, Any], rule: Dict[str, Any]) -> int:
+    def _find_bank_ledger_account(cur, bank_account_id: Optional[int]) -> Optional[int]:
         """
-        Create ledger entry(s) from a matched rule.
+        Find the chart-of-accounts entry that books a bank account's side of a ledger entry.
+        
+        Returns:
+            account id, or None if no suitable account exists
+        """
+        # Prefer an active ASSET account named like a bank or cash account (when the bank
+        # account exists), otherwise the first active ASSET account in the 1000-1999 range.
+        # Both branches run in one round trip and use idx_accounts_active_type_code.
+        cur.execute("""
+            SELECT COALESCE(
+                (SELECT a.id
+                 FROM pharma.bank_accounts ba
+                 JOIN pharma.accounts a
+                   ON a.type = 'ASSET'
+                  AND (LOWER(a.name) LIKE '%%bank%%' OR LOWER(a.name) LIKE '%%cash%%')
+                  AND a.is_active = true
+                 WHERE ba.id = %s
+                 ORDER BY a.code
+                 LIMIT 1),
+                (SELECT id FROM pharma.accounts
+                 WHERE code >= '1000' AND code < '2000'
+                 AND type = 'ASSET'
+                 AND is_active = true
+                 ORDER BY code
+                 LIMIT 1)
+            ) AS id
+        """, (bank_account_id,))
+        result = cur.fetchone()
+        bank_ledger_account_id = result['id'] if result else None
+        
+        return bank_ledger_account_id
+    
+    @staticmethod
+    def _build_ledger_entry(cur, transaction: Dict[str, Any], rule: Dict[str, Any],
+                            bank_ledger_accounts: Optional[Dict[Optional[int], int]] = None) -> Tuple:
+        """
+        Build the ledger entry values for a matched rule.
         
         For now, we support single allocation (one ledger entry per transaction).
         Splits (multiple allocations) can be added later.
         
+        bank_ledger_accounts, when given, caches the bank ledger account per
+        bank_account_id across calls.
+        
         Returns:
-            ledger_entry_id
+            (pharmacy_id, date, description, amount, debit_account_id,
+             credit_account_id, bank_transaction_id)
         """
         import json
         
-        with conn.cursor() as cur:
-            # Parse allocate_json
+        # Parse allocate_json once per rule, however many transactions it matches
+        allocate = rule.get('allocate')
+        if allocate is None:
             allocate = rule['allocate_json']
             if isinstance(allocate, str):
                 allocate = json.loads(allocate)
-            
-            if not allocate or len(allocate) == 0:
-                raise ValueError(f"Rule {rule['id']} has no allocations")
-            
-            # For now, use first allocation (single entry)
-            # TODO: Support splits (multiple ledger entries)
-            allocation = allocate[0]
-            account_id = allocation['account_id']
-            percent = allocation.get('percent', 100)
-            
-            # Calculate amount
-            amount = float(transaction['amount'])
-            allocated_amount = abs(amount) * (percent / 100.0)
-            
-            # Get the bank account for this transaction
+            rule['allocate'] = allocate
+        
+        if not allocate or len(allocate) == 0:
+            raise ValueError(f"Rule {rule['id']} has no allocations")
+        
+        # For now, use first allocation (single entry)
+        # TODO: Support splits (multiple ledger entries)
+        allocation = allocate[0]
+        account_id = allocation['account_id']
+        percent = allocation.get('percent', 100)
+        
+        # Calculate amount
+        amount = float(transaction['amount'])
+        allocated_amount = abs(amount) * (percent / 100.0)
+        
+        # Get the bank account for this transaction
+        if 'bank_account_id' in transaction:
+            bank_account_id = transaction['bank_account_id']
+        else:
             cur.execute("""
                 SELECT bank_account_id FROM pharma.bank_transactions WHERE id = %s
             """, (transaction['id'],))
             txn_detail = cur.fetchone()
             bank_account_id = txn_detail['bank_account_id'] if txn_detail else None
-            
-            # Find the ledger account for this bank account
-            # We'll look for a bank account in the accounts table by matching name or using a default
-            # For now, we'll try to find an account with code starting with '1' (Assets) and type 'ASSET'
-            # that might be a bank account, or use a default
-            bank_ledger_account_id = None
-            
-            if bank_account_id:
-                # Try to find bank account by matching bank account name
-                cur.execute("""
-                    SELECT ba.name, ba.bank_name
-                    FROM pharma.bank_accounts ba
-                    WHERE ba.id = %s
-                """, (bank_account_id,))
-                bank_account = cur.fetchone()
-                
-                if bank_account:
-                    # Try to find matching account in chart of accounts
-                    # Look for accounts with "Bank" or "Cash" in name, type ASSET
-                    cur.execute("""
-                        SELECT id FROM pharma.accounts
-                        WHERE type = 'ASSET'
-                        AND (LOWER(name) LIKE '%bank%' OR LOWER(name) LIKE '%cash%')
-                        AND is_active = true
-                        ORDER BY code
-                        LIMIT 1
-                    """)
-                    bank_account_result = cur.fetchone()
-                    if bank_account_result:
-                        bank_ledger_account_id = bank_account_result['id']
-            
-            # If we still don't have a bank ledger account, use a default
-            # Look for account code 1000-1999 (Assets) that might be bank
-            if not bank_ledger_account_id:
-                cur.execute("""
-                    SELECT id FROM pharma.accounts
-                    WHERE code >= '1000' AND code < '2000'
-                    AND type = 'ASSET'
-                    AND is_active = true
-                    ORDER BY code
-                    LIMIT 1
-                """)
-                bank_account_result = cur.fetchone()
-                if bank_account_result:
-                    bank_ledger_account_id = bank_account_result['id']
-            
-            if not bank_ledger_account_id:
-                raise ValueError(f"Could not find a bank ledger account for transaction {transaction['id']}. Please configure bank account mapping.")
-            
-            # Build description
-            description = transaction.get('description', '')
-            if rule.get('contact_name'):
-                description = f"{description} ({rule['contact_name']})"
-            
-            # Determine debit/credit based on transaction amount
-            # Double-entry bookkeeping:
-            # - Positive amount (money in): Debit Bank, Credit Income/Other
-            # - Negative amount (money out): Debit Expense/Other, Credit Bank
-            if amount > 0:
-                # Money coming in
-                debit_account_id = bank_ledger_account_id
-                credit_account_id = account_id
-            else:
-                # Money going out
-                debit_account_id = account_id
-                credit_account_id = bank_ledger_account_id
-            
-            # Insert ledger entry
-            # Use 'BANK' source for now (will be 'BANK_RULE' after enum update)
-            cur.execute("""
-                INSERT INTO pharma.ledger_entries
-                (pharmacy_id, date, description, amount, debit_account_id, credit_account_id,
-                 source, source_reference_type, source_reference_id, bank_transaction_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
-                transaction['pharmacy_id'],
-                transaction['date'],
-                description,
-                allocated_amount,
-                debit_account_id,
-                credit_account_id,
-                'BANK',  # Will be updated to 'BANK_RULE' after enum update
-                'bank_transaction',
-                str(transaction['id']),
-                transaction['id']
-            ))
-            
-            result = cur.fetchone()
-            return result['id']
-
+        
+        if bank_ledger_accounts is not None and bank_account_id in bank_ledger_accounts:
+            bank_ledger_account_id = bank_ledger_accounts[bank_account_id]
+        else:
+            bank_ledger_account_id = BankRuleEngine._find_bank_ledger_account(cur, bank_account_id)
+            if bank_ledger_accounts is not None and bank_ledger_account_id:
+                bank_ledger_accounts[bank_account_id] = bank_ledger_account_id
+        
+        if not bank_ledger_account_id:
+            raise ValueError(f"Could not find a bank ledger account for transaction {transaction['id']}. Please configure bank account mapping.")
+        
+        # Build description
+        description = transaction.get('description', '')
+        if rule.get('contact_name'):
+            description = f"{description} ({rule['contact_name']})"
+        
+        # Determine debit/credit based on transaction amount
+        # Double-entry bookkeeping:
+        # - Positive amount (money in): Debit Bank, Credit Income/Other
+        # - Negative amount (money out): Debit Expense/Other, Credit Bank
+        if amount > 0:
+            # Money coming in
+            debit_account_id = bank_ledger_account_id
+            credit_account_id = account_id
+        else:
+            # Money going out
+            debit_account_id = account_id
+            credit_account_id = bank_ledger_account_id
+        
+        return (
+            transaction['pharmacy_id'],
+            transaction['date'],
+            description,
+            allocated_amount,
+            debit_account_id,
+            credit_account_id,
+            transaction['id']
+        )
@@ -5,12 +5,43 @@ Based on Ruby implementation for consistency.
 """
 
 import hashlib
-from typing import Optional, Tuple, List
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Optional, Tuple, List, Union
 from datetime import date
 from decimal import Decimal
 
+import orjson
+
+from ..db import get_conn
 from .bank_csv_parser import BankCsvParser, ParseResult, ParsedRow
 
+logger = logging.getLogger(__name__)
+
+
+def _raw_data_json(raw_data: Optional[dict]) -> Optional[str]:
+    """Serialize a CSV row dict for a jsonb column (extra cells of ragged rows sit under a None key)"""
+    return orjson.dumps(raw_data, option=orjson.OPT_NON_STR_KEYS).decode() if raw_data else None
+
+
+@lru_cache(maxsize=64)
+def _external_id_prefix(bank_account_id: int):
+    """sha256 state after "{bank_account_id}|"; every external_id for the account starts from it"""
+    return hashlib.sha256(f"{bank_account_id}|".encode('utf-8'), usedforsecurity=False)
+
+
+def _external_id(bank_account_id: int, row_key: str) -> str:
+    """
+    sha256("{bank_account_id}|{date}|{amount}|{description}"), where row_key is everything
+    after the account id.
+    """
+    digest = _external_id_prefix(bank_account_id).copy()
+    digest.update(row_key.encode('utf-8'))
+    return digest.hexdigest()
+
 
 class SuspectedDuplicate:
     """Represents a transaction that might be a duplicate"""
@@ -72,6 +103,33 @@ class BankStatementImporter:
         )
         return importer._import()
     
+    @staticmethod
+    def import_many(jobs: List[dict], max_workers: int = 4) -> List[Union[ImportResult, Exception]]:
+        """
+        Import several bank statements concurrently, each on its own pooled connection.
+        
+        Args:
+            jobs: import_statement keyword arguments (without conn), one dict per file
+            max_workers: Concurrent imports; keep well below the pool's max_size so
+                request handlers can still get a connection
+        
+        Returns:
+            One entry per job, in order: its ImportResult, or the exception that failed it.
+            Every import is its own transaction, so one failure does not affect the others.
+        """
+        def run(job: dict) -> ImportResult:
+            with get_conn() as conn:
+                return BankStatementImporter.import_statement(conn, **job)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(run, job) for job in jobs]
+        
+        results = []
+        for future in futures:
+            error = future.exception()
+            results.append(error if error is not None else future.result())
+        return results
+    
     def __init__(self, conn, pharmacy_id: int, bank_account_id: int,
                  file_content: bytes, file_name: str,
                  uploaded_by_user_id: Optional[int] = None,
@@ -88,92 +146,163 @@ class BankStatementImporter:
     
     def _import(self) -> ImportResult:
         """Main import logic - fastest path: no duplicate pre-check, bulk insert, ignore duplicates."""
-        import logging
-        import json
-        logger = logging.getLogger(__name__)
 
-        # Parse CSV (already fast)
-        parse_result = BankCsvParser.parse(self.file_content)
+        # Parse CSV lazily; rows are read and inserted one chunk at a time
+        parse_stream = BankCsvParser.iter_parse(self.file_content)
 
         inserted = 0
-        skipped = 0  # will count rows skipped by ON CONFLICT
+        skipped = 0  # rows skipped by ON CONFLICT on (bank_account_id, external_id)
+        prepared = 0
         batch_id = None
 
         with self.conn.cursor() as cur:
-            # Create import batch
-            batch_id = self._create_import_batch(cur, parse_result.summary)
-
-            # Prepare transactions for bulk insert
-            transactions_to_insert = []
-            for row in parse_result.rows:
-                external_id = self._build_external_id(row)
-                amount_value = float(row.amount) if row.amount is not None else None
-                balance_value = float(row.balance) if row.balance is not None else None
-                raw_data_json = json.dumps(row.raw_data) if row.raw_data else None
-                description = row.description or ""
-                raw_description = row.raw_description or description
-
-                transactions_to_insert.append((
-                    batch_id,
-                    self.bank_account_id,
-                    self.pharmacy_id,
-                    row.date,
-                    description,
-                    raw_description,
-                    row.reference,
-                    amount_value,
-                    balance_value,
-                    raw_data_json,
-                    external_id
-                ))
-
-            logger.info(f"Prepared {len(transactions_to_insert)} transactions for insertion")
-
-            if transactions_to_insert:
-                try:
-                    insert_sql = """
+            # Create import batch; its period is set once every row has been read
+            batch_id = self._create_import_batch(cur, {})
+
+            # One multi-row INSERT per chunk: the rows travel as column arrays
+            insert_sql = """
+                INSERT INTO pharma.bank_transactions
+                (bank_import_batch_id, bank_account_id, pharmacy_id, date, description,
+                 raw_description, reference, amount, balance, raw_data, external_id)
+                SELECT %s, %s, %s, t.*
+                FROM unnest(%s::date[], %s::text[], %s::text[], %s::text[],
+                            %s::numeric[], %s::numeric[], %s::jsonb[], %s::text[]) AS t
+                ON CONFLICT (bank_account_id, external_id) WHERE external_id IS NOT NULL
+                DO NOTHING
+            """
+            BATCH = 1000
+            MAX_PENDING = 4  # chunks parsed ahead of the insert thread
+            COPY_THRESHOLD = 5000  # rows beyond this are COPYed into a staging table
+            staging = False
+            rows = iter(parse_stream)
+            build_external_id = self._build_external_id
+            # Repeated fees and subscriptions in this file are hashed once; dropped with the import
+            external_ids: Dict[str, str] = {}
+
+            def insert_chunk(chunk) -> int:
+                # The statement text never changes, so prepare it on first use; pooled
+                # connections then reuse the server-side plan across chunks and imports
+                cur.execute(insert_sql, (
+                    batch_id, self.bank_account_id, self.pharmacy_id,
+                    *(list(column) for column in zip(*chunk))
+                ), prepare=True)
+                return cur.rowcount if cur.rowcount and cur.rowcount > 0 else 0
+
+            def create_staging() -> int:
+                cur.execute("""
+                    CREATE TEMP TABLE bank_transactions_import
+                    (date date, description text, raw_description text, reference text,
+                     amount numeric, balance numeric, raw_data jsonb, external_id text)
+                    ON COMMIT DROP
+                """)
+                return 0
+
+            def stage_chunk(chunk) -> int:
+                with cur.copy("COPY bank_transactions_import FROM STDIN") as copy:
+                    for record in chunk:
+                        copy.write_row(record)
+                return 0
+
+            # Parse on this thread while a single worker inserts earlier chunks, so CSV parsing
+            # overlaps the database round trips. The worker is the only user of cur until drained.
+            insert_executor = ThreadPoolExecutor(max_workers=1)
+            pending = deque()
+            try:
+                while True:
+                    # Prepare the next chunk of transactions for bulk insert
+                    chunk = []
+                    for row in islice(rows, BATCH):
+                        external_id = build_external_id(row, external_ids)
+                        raw_data_json = _raw_data_json(row.raw_data)
+                        description = row.description or ""
+                        raw_description = row.raw_description or description
+
+                        chunk.append((
+                            row.date,
+                            description,
+                            raw_description,
+                            row.reference,
+                            row.amount,
+                            row.balance,
+                            raw_data_json,
+                            external_id
+                        ))
+                    if not chunk:
+                        break
+
+                    prepared += len(chunk)
+                    if len(pending) >= MAX_PENDING:
+                        inserted += pending.popleft().result()
+                    if prepared > COPY_THRESHOLD:
+                        # Large statement: stream the rest through COPY instead of parsing
+                        # one INSERT per chunk, then move it across in a single statement
+                        if not staging:
+                            pending.append(insert_executor.submit(create_staging))
+                            staging = True
+                        pending.append(insert_executor.submit(stage_chunk, chunk))
+                    else:
+                        pending.append(insert_executor.submit(insert_chunk, chunk))
+
+                while pending:
+                    inserted += pending.popleft().result()
+
+                if staging:
+                    cur.execute("""
                         INSERT INTO pharma.bank_transactions
                         (bank_import_batch_id, bank_account_id, pharmacy_id, date, description,
                          raw_description, reference, amount, balance, raw_data, external_id)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT DO NOTHING
-                    """
-                    BATCH = 1000
-                    for i in range(0, len(transactions_to_insert), BATCH):
-                        chunk = transactions_to_insert[i:i+BATCH]
-                        cur.executemany(insert_sql, chunk)
-                        inserted_chunk = cur.rowcount if cur.rowcount and cur.rowcount > 0 else 0
-                        inserted += inserted_chunk
-                    skipped = len(transactions_to_insert) - inserted
-                    logger.info(f"Inserted {inserted} / {len(transactions_to_insert)} transactions (skipped {skipped} duplicates/conflicts)")
-                except Exception as bulk_error:
-                    logger.error(f"Bulk insert failed: {str(bulk_error)}")
-                    raise
+                        SELECT %s, %s, %s, s.*
+                        FROM bank_transactions_import s
+                        ON CONFLICT (bank_account_id, external_id) WHERE external_id IS NOT NULL
+                        DO NOTHING
+                    """, (batch_id, self.bank_account_id, self.pharmacy_id))
+                    inserted += cur.rowcount if cur.rowcount and cur.rowcount > 0 else 0
+            except Exception as bulk_error:
+                logger.error(f"Bulk insert failed: {str(bulk_error)}")
+                raise
+            finally:
+                insert_executor.shutdown(cancel_futures=True)
+
+            if prepared:
+                skipped = prepared - inserted
+                logger.info(f"Inserted {inserted} / {prepared} transactions (skipped {skipped} duplicates/conflicts)")
             else:
-                logger.warning(f"No transactions to insert! File had {len(parse_result.rows)} rows.")
+                logger.warning(f"No transactions to insert! File had {len(parse_stream.errors)} unparseable rows.")
 
             # Insert parsing errors into bank_import_errors table (best-effort)
-            for error in parse_result.errors:
+            errors = parse_stream.errors
+            if errors:
                 try:
-                    cur.execute("""
-                        INSERT INTO pharma.bank_import_errors
-                        (bank_import_batch_id, row_number, raw_data, error_message)
-                        VALUES (%s, %s, %s, %s)
-                    """, (
-                        batch_id,
-                        error.row_number,
-                        json.dumps(error.raw_data) if error.raw_data else None,
-                        error.error
-                    ))
-                except Exception:
-                    continue
-
-            # Update batch status
+                    # Savepoint, so a failure here rolls back only this insert and the
+                    # transactions already written can still be committed
+                    with self.conn.transaction():
+                        cur.execute("""
+                            INSERT INTO pharma.bank_import_errors
+                            (bank_import_batch_id, row_number, raw_data, error_message)
+                            SELECT %s, e.*
+                            FROM unnest(%s::integer[], %s::jsonb[], %s::text[]) AS e
+                        """, (
+                            batch_id,
+                            [error.row_number for error in errors],
+                            [_raw_data_json(error.raw_data) for error in errors],
+                            [error.error for error in errors]
+                        ))
+                except Exception as error_insert_error:
+                    logger.warning(f"Could not record import errors: {str(error_insert_error)}")
+
+            # Update batch status and statement period
+            summary = parse_stream.summary
             cur.execute("""
                 UPDATE pharma.bank_import_batches
-                SET status = 'IMPORTED'
+                SET status = 'IMPORTED',
+                    period_start = %s,
+                    period_end = %s
                 WHERE id = %s
-            """, (batch_id,))
+            """, (
+                date.fromisoformat(summary['min_date']) if summary.get('min_date') else None,
+                date.fromisoformat(summary['max_date']) if summary.get('max_date') else None,
+                batch_id
+            ))
 
             self.conn.commit()
 
@@ -181,8 +310,8 @@ class BankStatementImporter:
             bank_import_batch_id=batch_id,
             transactions_inserted=inserted,
             transactions_skipped_as_duplicates=skipped,
-            errors=parse_result.errors,
-            summary=parse_result.summary,
+            errors=errors,
+            summary=summary,
             suspected_duplicates=[]  # not computed in fast-path
         )
     
@@ -214,215 +343,18 @@ class BankStatementImporter:
         
         return cur.fetchone()['id']
     
-    def _create_bank_transaction(self, cur, batch_id: int, row: ParsedRow):
-        """Create bank_transaction record"""
-        import json
-        
-        external_id = self._build_external_id(row)
-        
-        # Ensure all values are properly formatted
-        amount_value = float(row.amount) if row.amount is not None else None
-        balance_value = float(row.balance) if row.balance is not None else None
-        raw_data_json = json.dumps(row.raw_data) if row.raw_data else None
-        
-        # Ensure description is not None
-        description = row.description or ""
-        raw_description = row.raw_description or description
-        
-        cur.execute("""
-            INSERT INTO pharma.bank_transactions
-            (bank_import_batch_id, bank_account_id, pharmacy_id, date, description,
-             raw_description, reference, amount, balance, raw_data, external_id)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            batch_id,
-            self.bank_account_id,
-            self.pharmacy_id,
-            row.date,
-            description,
-            raw_description,
-            row.reference,
-            amount_value,
-            balance_value,
-            raw_data_json,
-            external_id
-        ))
-    
-    def _check_external_id_duplicate(self, cur, external_id: str) -> Optional[dict]:
-        """
-        Check for duplicate by external_id (highest confidence).
-        Returns existing transaction info if found, None otherwise.
-        """
-        if not external_id:
-            return None
-        try:
-            cur.execute("""
-                SELECT id, date, description, amount, bank_import_batch_id
-                FROM pharma.bank_transactions
-                WHERE bank_account_id = %s
-                  AND external_id = %s
-                LIMIT 1
-            """, (self.bank_account_id, external_id))
-            result = cur.fetchone()
-            return dict(result) if result else None
-        except Exception:
-            return None
-    
-    def _check_exact_duplicate(self, cur, row: ParsedRow) -> Optional[dict]:
-        """
-        Check for exact duplicate: same date + amount + description.
-        Returns existing transaction info if found, None otherwise.
-        """
-        try:
-            cur.execute("""
-                SELECT id, date, description, amount, bank_import_batch_id
-                FROM pharma.bank_transactions
-                WHERE bank_account_id = %s
-                  AND date = %s
-                  AND amount = %s
-                  AND description = %s
-                LIMIT 1
-            """, (
-                self.bank_account_id,
-                row.date,
-                float(row.amount),
-                row.description
-            ))
-            result = cur.fetchone()
-            return dict(result) if result else None
-        except Exception:
-            return None
-    
-    def _check_similar_duplicate(self, cur, row: ParsedRow) -> Optional[dict]:
-        """
-        Check for similar duplicate: same date + amount (less strict).
-        This catches cases where description might vary slightly.
-        Returns existing transaction info if found, None otherwise.
-        """
-        try:
-            cur.execute("""
-                SELECT id, date, description, amount, bank_import_batch_id
-                FROM pharma.bank_transactions
-                WHERE bank_account_id = %s
-                  AND date = %s
-                  AND amount = %s
-                LIMIT 1
-            """, (
-                self.bank_account_id,
-                row.date,
-                float(row.amount)
-            ))
-            result = cur.fetchone()
-            return dict(result) if result else None
-        except Exception:
-            return None
-    
-    def _build_external_id(self, row: ParsedRow) -> Optional[str]:
+    def _build_external_id(self, row: ParsedRow, cache: Optional[Dict[str, str]] = None) -> Optional[str]:
         """
         Build a deterministic external_id from transaction data.
         This creates a hash that can be used for duplicate detection.
+        Rows already in `cache` (keyed by their formatted date|amount|description) skip hashing.
         """
-        # Create a deterministic hash from transaction data
-        hash_input = f"{self.bank_account_id}|{row.date}|{row.amount}|{row.description}"
-        return hashlib.sha256(hash_input.encode('utf-8')).hexdigest()
-
-    def _load_existing_transactions(self, cur, rows: List[ParsedRow]):
-        """
-        Bulk-load potential duplicates to avoid per-row queries.
-        Returns three dictionaries keyed by:
-        - external_id
-        - (date, amount, description)
-        - (date, amount)
-        """
-        existing_by_external = {}
-        existing_by_exact = {}
-        existing_by_similar = {}
-
-        if not rows:
-            return existing_by_external, existing_by_exact, existing_by_similar
-
-        # Collect unique keys to keep payload small
-        external_ids = []
-        exact_keys = []
-        similar_keys = []
-
-        for row in rows:
-            external_id = self._build_external_id(row)
-            if external_id:
-                external_ids.append(external_id)
-            exact_keys.append((row.date, row.amount, row.description))
-            similar_keys.append((row.date, row.amount))
-
-        # Deduplicate while preserving order for array zip
-        def _unique(seq):
-            seen = set()
-            out = []
-            for item in seq:
-                if item in seen:
-                    continue
-                seen.add(item)
-                out.append(item)
-            return out
-
-        external_ids = _unique(external_ids)
-        exact_keys = _unique(exact_keys)
-        similar_keys = _unique(similar_keys)
-
-        CHUNK = 1000
-
-        # External ID lookup
-        for i in range(0, len(external_ids), CHUNK):
-            chunk = external_ids[i:i + CHUNK]
-            cur.execute("""
-                SELECT id, date, description, amount, bank_import_batch_id, external_id
-                FROM pharma.bank_transactions
-                WHERE bank_account_id = %s
-                  AND external_id = ANY(%s)
-            """, (self.bank_account_id, chunk))
-            for row in cur.fetchall():
-                existing_by_external[row['external_id']] = row
-
-        # Exact match lookup (date, amount, description)
-        for i in range(0, len(exact_keys), CHUNK):
-            chunk = exact_keys[i:i + CHUNK]
-            dates = [k[0] for k in chunk]
-            amounts = [k[1] for k in chunk]
-            descriptions = [k[2] for k in chunk]
-            cur.execute("""
-                WITH data(date, amount, description) AS (
-                    SELECT * FROM unnest(%s::date[], %s::numeric[], %s::text[])
-                )
-                SELECT t.id, t.date, t.description, t.amount, t.bank_import_batch_id
-                FROM data d
-                JOIN pharma.bank_transactions t
-                  ON t.bank_account_id = %s
-                 AND t.date = d.date
-                 AND t.amount = d.amount
-                 AND t.description = d.description
-            """, (dates, amounts, descriptions, self.bank_account_id))
-            for row in cur.fetchall():
-                key = (row['date'], Decimal(str(row['amount'])), row['description'])
-                existing_by_exact[key] = row
-
-        # Similar match lookup (date, amount)
-        for i in range(0, len(similar_keys), CHUNK):
-            chunk = similar_keys[i:i + CHUNK]
-            dates = [k[0] for k in chunk]
-            amounts = [k[1] for k in chunk]
-            cur.execute("""
-                WITH data(date, amount) AS (
-                    SELECT * FROM unnest(%s::date[], %s::numeric[])
-                )
-                SELECT DISTINCT ON (t.date, t.amount)
-                       t.id, t.date, t.description, t.amount, t.bank_import_batch_id
-                FROM data d
-                JOIN pharma.bank_transactions t
-                  ON t.bank_account_id = %s
-                 AND t.date = d.date
-                 AND t.amount = d.amount
-            """, (dates, amounts, self.bank_account_id))
-            for row in cur.fetchall():
-                key = (row['date'], Decimal(str(row['amount'])))
-                existing_by_similar[key] = row
-
-        return existing_by_external, existing_by_exact, existing_by_similar
+        # Create a deterministic hash from transaction data:
+        # sha256("{bank_account_id}|{date}|{amount}|{description}")
+        row_key = f"{row.date}|{row.amount}|{row.description}"
+        if cache is None:
+            return _external_id(self.bank_account_id, row_key)
+        external_id = cache.get(row_key)
+        if external_id is None:
+            external_id = cache[row_key] = _external_id(self.bank_account_id, row_key)
+        return external_id
@@ -277,6 +277,10 @@ async def main_loop() -> None:
     
     print("✅ Apple APNs configured successfully")
     
+    # Open the APNs connection now and keep it alive between bursty runs
+    await apple_service.warm_up()
+    apple_service.start_keepalive()
+    
     while True:
         try:
             await run_once()
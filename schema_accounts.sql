@@ -36,6 +36,8 @@ CREATE INDEX IF NOT EXISTS idx_accounts_category ON pharma.accounts(category);
 CREATE INDEX IF NOT EXISTS idx_accounts_parent ON pharma.accounts(parent_account_id);
 CREATE INDEX IF NOT EXISTS idx_accounts_active ON pharma.accounts(is_active);
 CREATE INDEX IF NOT EXISTS idx_accounts_display_order ON pharma.accounts(display_order);
+-- Bank ledger account lookup in the bank rule engine (active accounts of a type, by code)
+CREATE INDEX IF NOT EXISTS idx_accounts_active_type_code ON pharma.accounts(type, code) WHERE is_active;
 
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION pharma.update_account_updated_at()
@@ -181,6 +181,19 @@ CREATE TRIGGER trigger_update_ai_suggestion_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION pharma.update_ai_suggestion_updated_at();
 
+-- ========== CLASSIFICATION MEMO ==========
+-- Learned description -> account mappings from accepted AI suggestions.
+-- norm_key is the description upper-cased, digits stripped, whitespace
+-- collapsed and cut to 40 chars (see bank_ai_classifier.normalize_description_key).
+-- Confident keys are classified directly without calling the model.
+CREATE TABLE IF NOT EXISTS pharma.tx_classification_memo (
+  norm_key       text PRIMARY KEY,
+  account_id     bigint NOT NULL REFERENCES pharma.accounts(id) ON DELETE CASCADE,
+  confidence     numeric(3,2) NOT NULL CHECK (confidence >= 0 AND confidence <= 1),
+  n_hits         integer NOT NULL DEFAULT 0,
+  updated_at     timestamptz NOT NULL DEFAULT now()
+);
+
 -- ========== UPDATE BANK TRANSACTIONS ==========
 -- Add classification fields to bank_transactions
 ALTER TABLE pharma.bank_transactions
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Create the pharma.tx_classification_memo table (see schema_bank_rules.sql)
+on databases set up before it was added. Safe to run repeatedly.
+
+Usage:
+    python scripts/migrate_classification_memo.py
+"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.db.conn import get_conn
+
+def migrate_classification_memo():
+    """Create the classification memo table if it is missing"""
+
+    print("=" * 60)
+    print("MIGRATING TX_CLASSIFICATION_MEMO TABLE")
+    print("=" * 60)
+    print()
+
+    try:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT to_regclass('pharma.tx_classification_memo') IS NOT NULL AS present")
+                if cur.fetchone()['present']:
+                    print("✓ Table 'tx_classification_memo' already exists")
+                    return
+
+                print("Creating table 'tx_classification_memo'...")
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS pharma.tx_classification_memo (
+                      norm_key       text PRIMARY KEY,
+                      account_id     bigint NOT NULL REFERENCES pharma.accounts(id) ON DELETE CASCADE,
+                      confidence     numeric(3,2) NOT NULL CHECK (confidence >= 0 AND confidence <= 1),
+                      n_hits         integer NOT NULL DEFAULT 0,
+                      updated_at     timestamptz NOT NULL DEFAULT now()
+                    )
+                """)
+                conn.commit()
+                print("✓ Table 'tx_classification_memo' created")
+                print()
+                print("Run scripts/refresh_classification_memo.py to fill it from accepted suggestions.")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    migrate_classification_memo()
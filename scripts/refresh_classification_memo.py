@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Nightly refresh for the bank transaction classification memo.
+Rebuilds pharma.tx_classification_memo from accepted AI suggestions so the
+classifier can resolve recurring descriptions without calling the model.
+"""
+
+import os
+import sys
+from psycopg import connect
+from psycopg.rows import dict_row
+from pathlib import Path
+
+# Ensure project root for src.* imports
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from dotenv import load_dotenv, find_dotenv
+load_dotenv(find_dotenv(), override=False)
+
+DSN = os.environ.get("DATABASE_URL")
+
+# The norm_key expression mirrors normalize_description_key() in
+# pharma_api/app/services/bank_ai_classifier.py. The accepted account is read
+# from the ledger entry so user overrides are learned, not the raw suggestion.
+REFRESH_CLASSIFICATION_MEMO = """
+WITH accepted AS (
+  SELECT
+    left(upper(btrim(regexp_replace(
+      regexp_replace(coalesce(t.description, ''), '[0-9]+', '', 'g'),
+      '[[:space:]]+', ' ', 'g'
+    ))), 40) as norm_key,
+    CASE WHEN t.amount > 0 THEN l.credit_account_id ELSE l.debit_account_id END as account_id
+  FROM pharma.ai_suggestions s
+  JOIN pharma.bank_transactions t ON t.id = s.bank_transaction_id
+  JOIN pharma.ledger_entries l ON l.id = t.ledger_entry_id
+  WHERE s.status = 'accepted'
+),
+counts AS (
+  SELECT
+    norm_key,
+    account_id,
+    COUNT(*) as hits,
+    SUM(COUNT(*)) OVER (PARTITION BY norm_key) as total
+  FROM accepted
+  WHERE norm_key <> ''
+  GROUP BY norm_key, account_id
+),
+best AS (
+  SELECT DISTINCT ON (norm_key) norm_key, account_id, hits, total
+  FROM counts
+  ORDER BY norm_key, hits DESC, account_id
+)
+INSERT INTO pharma.tx_classification_memo AS m (
+  norm_key, account_id, confidence, n_hits, updated_at
+)
+SELECT
+  b.norm_key, b.account_id, ROUND(b.hits::numeric / b.total, 2), b.total, now()
+FROM best b
+ON CONFLICT (norm_key) DO UPDATE
+SET
+  account_id = EXCLUDED.account_id,
+  confidence = EXCLUDED.confidence,
+  n_hits = EXCLUDED.n_hits,
+  updated_at = now();
+"""
+
+def refresh_classification_memo():
+    """Rebuild memo entries from all accepted AI suggestions."""
+    if not DSN:
+        print("ERROR: DATABASE_URL not set")
+        sys.exit(1)
+
+    print("🔄 Refreshing classification memo...")
+
+    try:
+        with connect(DSN, row_factory=dict_row) as conn:
+            with conn.cursor() as cur:
+                # Set longer timeout for this operation
+                cur.execute("SET LOCAL statement_timeout = 300000;")  # 5 minutes
+
+                cur.execute(REFRESH_CLASSIFICATION_MEMO)
+
+                cur.execute("""
+                    SELECT COUNT(*) as total_keys,
+                           COUNT(*) FILTER (WHERE confidence > 0.85 AND n_hits >= 2) as trusted_keys
+                    FROM pharma.tx_classification_memo
+                """)
+                result = cur.fetchone()
+
+                conn.commit()
+                print(f"✅ Memo holds {result['total_keys']} descriptions "
+                      f"({result['trusted_keys']} trusted for auto-classification)")
+
+    except Exception as e:
+        print(f"❌ Error refreshing classification memo: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    refresh_classification_memo()